@@ -1,10 +1,19 @@
-from kiteconnect import KiteConnect
+from constants.settings import BROKER, DB_BACKEND, SIMULATED_BROKER_ERROR_RATE, SIMULATED_BROKER_LATENCY
 
-from constants.kite_credentials import API_KEY
+if BROKER == "SIMULATED":
+    if DB_BACKEND != "SQLITE":
+        raise ValueError("the simulated broker runs only with DB_BACKEND = \"SQLITE\", away from the live collections")
+    from services.simulated_broker import SimulatedBroker
 
-kite_context = KiteConnect(
-    api_key=API_KEY
-)
+    kite_context = SimulatedBroker(latency=SIMULATED_BROKER_LATENCY, error_rate=SIMULATED_BROKER_ERROR_RATE)
+else:
+    from kiteconnect import KiteConnect
+
+    from constants.kite_credentials import API_KEY
+
+    kite_context = KiteConnect(
+        api_key=API_KEY
+    )
 
 
 def set_access_token(access_token: str):
@@ -7,6 +7,68 @@ STOP_BUYING_TIME = datetime(__current_time.year, __current_time.month, __current
 
 SLEEP_INTERVAL: float = 45
 
+# maximum number of instruments kite accepts in a single ltp request
+LTP_BATCH_SIZE: int = 1000
+
+# price requests run in a thread pool, each attempt is limited by the timeout and retried with a growing backoff
+PRICE_FETCH_TIMEOUT: float = 5
+PRICE_FETCH_RETRIES: int = 4
+PRICE_FETCH_BACKOFF: float = 0.5
+PRICE_FETCH_CONCURRENCY: int = 4
+
+# KITE places the orders and fetches the prices with kite, SIMULATED uses the local simulated broker
+# (services/simulated_broker.py) which follows the recorded or random price paths, for testing without a market session
+BROKER: str = "KITE"
+SIMULATED_BROKER_LATENCY: float = 0.05
+SIMULATED_BROKER_ERROR_RATE: float = 0.
+
+# MONGO keeps the collections in the mongo cluster of constants/db_settings.py, SQLITE keeps them in the local
+# sqlite file at SQLITE_DB_PATH (utils/sqlite_db.py), for single node deployments and for running without network.
+# The simulated broker only runs with SQLITE, in a file of its own, so that paper orders never reach the live data
+DB_BACKEND: str = "MONGO"
+SQLITE_DB_PATH: str = "temp/simulated.sqlite3" if BROKER == "SIMULATED" else "temp/db.sqlite3"
+
+# source of the daily bars the screener (load_predicted_files.py) appends to its local store (utils/ohlc_store.py):
+# YAHOO downloads them, CSV reads them from SCREENER_CSV_DIRECTORY/<symbol>.csv and OFFLINE only uses the stored bars
+SCREENER_DATA_SOURCE: str = "YAHOO"
+SCREENER_CSV_DIRECTORY: str = "temp/daily_bars"
+
+# number of documents fetched per round trip while loading the collections at startup
+DB_BATCH_SIZE: int = 1000
+
+# the changed stocks, positions and holdings are saved every CHECKPOINT_INTERVAL seconds in bulk writes of
+# CHECKPOINT_BATCH_SIZE documents, the ticks wait for the checkpoint if more than CHECKPOINT_MAX_PENDING are waiting
+CHECKPOINT_INTERVAL: float = 10
+CHECKPOINT_BATCH_SIZE: int = 500
+CHECKPOINT_MAX_PENDING: int = 5000
+
+# kite accepts at most 10 orders per second, the orders are sent by ORDER_CONCURRENCY workers within that limit
+ORDER_RATE_LIMIT: float = 10
+ORDER_CONCURRENCY: int = 10
+
+# POLLING fetches the prices every SLEEP_INTERVAL, KITE_TICKER streams them from the kite websocket
+# and REPLAY streams the recorded ticks from the local replay server (services/replay_server.py)
+TICK_SOURCE: str = "POLLING"
+# a kite websocket streams at most KITE_TICKER_MAX_INSTRUMENTS instruments and at most KITE_TICKER_MAX_CONNECTIONS
+# websockets can be opened, more instruments than that can only be polled
+KITE_TICKER_MAX_INSTRUMENTS: int = 3000
+KITE_TICKER_MAX_CONNECTIONS: int = 3
+REPLAY_SERVER_HOST: str = "127.0.0.1"
+REPLAY_SERVER_PORT: int = 8083
+
+# the ticks received in the session are journaled in TICK_JOURNAL_DIRECTORY. The simulated broker and the replay
+# server play the ticks recorded in RECORDED_TICK_DIRECTORY, hence with either of them the session is journaled in a
+# directory of its own so that the recorded journals are never appended to
+RECORDED_TICK_DIRECTORY: str = "temp/ticks"
+TICK_JOURNAL_DIRECTORY: str = (
+    "temp/simulated_ticks" if BROKER == "SIMULATED" or TICK_SOURCE == "REPLAY" else RECORDED_TICK_DIRECTORY
+)
+
+# the prices of a stock are not kept in memory, the indicators carry them forward. Their state is saved next to
+# the tick journal every INDICATOR_SNAPSHOT_INTERVAL ticks so that on a restart only the ticks received after the
+# snapshot are replayed
+INDICATOR_SNAPSHOT_INTERVAL: int = 20
+
 # expected returns are set in this section
 DELIVERY_INITIAL_RETURN = 0.008
 DELIVERY_INCREMENTAL_RETURN = 0.006
@@ -6,6 +6,7 @@ from quart_cors import cors
 from constants.global_contexts import set_access_token, kite_context
 from routes.stock_input import stocks_input
 from services.background_process import background_task
+from services.checkpoint import checkpoint_queue
 
 
 app = Quart(__name__)
@@ -48,6 +49,14 @@ async def stop_background_tasks():
     return {"message": "All task cancelled"}
 
 
+@app.after_serving
+async def save_checkpoint():
+    """
+        the changes which have not been checkpointed yet are saved when the server shuts down
+    """
+    await checkpoint_queue.close()
+
+
 resource_list: list[Blueprint] = [stocks_input]
 
 for resource in resource_list:
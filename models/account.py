@@ -1,11 +1,14 @@
+from functools import partial
 from logging import Logger
 
 from constants.enums.position_type import PositionType
 from constants.enums.product_type import ProductType
+from models.stage_table import StageTable
 from models.stock_info import StockInfo
 from models.stock_stages.holdings import Holding
 from models.stock_stages.positions import Position
-from services.take_position import long
+from services.checkpoint import checkpoint_queue
+from services.order_pipeline import Order, order_pipeline
 from utils.logger import get_logger
 
 logger: Logger = get_logger(__name__)
@@ -16,6 +19,9 @@ class Account:
     def __init__(self) -> None:
         self.positions: dict[str, Position] = {}
         self.holdings: dict[str, Holding] = {}
+        self.stage_table = StageTable()
+        # symbols whose buy order has been queued but not yet placed
+        self.pending_buys: set[str] = set()
 
     def buy_stocks(self, stock_to_track: dict[str, StockInfo]):
         """
@@ -25,20 +31,73 @@ class Account:
         """
 
         for stock_key in stock_to_track:
-            if stock_key not in self.positions.keys() and stock_to_track[stock_key].whether_buy() and stock_key not in self.holdings.keys():
-                if long(
-                    symbol=stock_to_track[stock_key].symbol,
-                    quantity=int(5000 / stock_to_track[stock_key].latest_indicator_price),
-                    product_type=ProductType.DELIVERY,
-                    exchange=stock_to_track[stock_key].exchange
-                ):
-                    logger.info(f"{stock_to_track[stock_key].stock_name} has been bought @ {stock_to_track[stock_key].latest_price}.")
-                    self.positions[stock_key] = Position(
-                        buy_price=stock_to_track[stock_key].latest_price,
-                        stock=stock_to_track[stock_key],
-                        position_type=PositionType.LONG,
-                        position_price=stock_to_track[stock_key].latest_indicator_price,
-                        quantity=int(5000 / stock_to_track[stock_key].latest_indicator_price),
-                        product_type=ProductType.DELIVERY,
-                        symbol=stock_key
-                    )
+            if stock_key not in self.positions.keys() and stock_key not in self.pending_buys and stock_to_track[stock_key].whether_buy() and stock_key not in self.holdings.keys():
+                self.buy(stock_key, stock_to_track[stock_key])
+
+    def buy(self, stock_key: str, stock: StockInfo):
+        """
+            queues a delivery order for the stock in the order pipeline, the position is opened once it is placed.
+            The position is taken at the prices at the time of the signal
+        """
+        self.pending_buys.add(stock_key)
+        order_pipeline.submit(Order(
+            symbol=stock.symbol,
+            quantity=int(5000 / stock.latest_indicator_price),
+            product_type=ProductType.DELIVERY,
+            exchange=stock.exchange,
+            position_type=PositionType.LONG,
+            callback=partial(self.open_position, stock_key, stock, stock.latest_price, stock.latest_indicator_price)
+        ))
+
+    def open_position(self, stock_key: str, stock: StockInfo, buy_price: float, position_price: float, order: Order):
+        """
+            called by the order pipeline with the result of the buy order
+        """
+        self.pending_buys.discard(stock_key)
+        if not order.placed:
+            return
+        logger.info(f"{stock.stock_name} has been bought @ {buy_price}.")
+        self.positions[stock_key] = Position(
+            buy_price=buy_price,
+            stock=stock,
+            position_type=PositionType.LONG,
+            position_price=position_price,
+            quantity=order.quantity,
+            product_type=order.product_type,
+            symbol=stock_key
+        )
+        checkpoint_queue.mark(self.positions[stock_key])
+
+    def sell_breached(self, symbols: set[str] | None = None):
+        """
+            sells the positions and holdings whose trigger is breached and ratchets the trigger of the others.
+            If symbols are given then only the positions and holdings of those symbols are evaluated
+        """
+        self.stage_table.sync(list(self.positions.values()) + list(self.holdings.values()))
+
+        for stage in self.stage_table.evaluate(self.stage_table.rows_of(symbols)):
+            stages = self.positions if self.positions.get(stage.symbol) is stage else self.holdings
+            if stage.sell(partial(self.close_stage, stages, stage)):
+                logger.info(f" line 89 -->sell {stage.stock.stock_name} at {stage.stock.latest_price}")
+                if self.positions.get(stage.symbol) is stage:
+                    del self.positions[stage.symbol]
+                if self.holdings.get(stage.symbol) is stage:
+                    del self.holdings[stage.symbol]
+                self.stage_table.remove(stage)
+                checkpoint_queue.mark_deleted(stage)
+
+    def close_stage(self, stages: dict[str, Position | Holding], stage: Position | Holding, order: Order):
+        """
+            called by the order pipeline with the result of the sell order of a stage. Once the order has been placed
+            the wallet booked by the stage is saved and used by the other stages of the stock. Otherwise, the stage is
+            opened again in the positions or the holdings it was sold from, so that it is evaluated again on the next
+            tick
+        """
+        if order.placed:
+            self.stage_table.wallet_changed(stage.stock)
+            checkpoint_queue.mark(stage.stock)
+        elif stage.symbol in stages:
+            logger.error(f"{stage.symbol} has been opened again, its unsold stage is dropped")
+        else:
+            stages[stage.symbol] = stage
+            checkpoint_queue.mark(stage)
@@ -0,0 +1,71 @@
+"""
+    Transaction cost of many trades at once, for backtests and the screener.
+
+    Every function takes arrays (or scalars) of buying price, selling price and quantity and returns a dict of arrays
+    with each of the charges, keyed by the attribute names of DeliveryTransactionCost and IntradayTransactionCost.
+    The numbers are identical to the ones computed one trade at a time.
+"""
+import numpy as np
+
+
+def round_like_python(values: np.ndarray, decimals: int = 2) -> np.ndarray:
+    """
+        np.round scales, rounds and scales back, which can differ from python's round for the values which are
+        (almost) exactly halfway. Those values are rounded again with python's round.
+    """
+    rounded = np.asarray(np.round(values, decimals))
+    scaled = values * 10 ** decimals
+    for index in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        rounded.flat[index] = round(float(values.flat[index]), decimals)
+    return rounded
+
+
+def common_charges(buying_price, selling_price, quantity) -> dict[str, np.ndarray]:
+    buying_price = np.asarray(buying_price, dtype=float)
+    selling_price = np.asarray(selling_price, dtype=float)
+    quantity = np.asarray(quantity)
+
+    turnover = (buying_price + selling_price) * quantity
+    return {
+        "profit_or_loss": (selling_price - buying_price) * quantity,
+        "turnover": turnover,
+        "net_transaction_charges": round_like_python((0.00345 / 100) * turnover),
+        "sebi_charges": round_like_python(((turnover / 10000000) * 10) * 1.18),
+    }
+
+
+def delivery_charges(buying_price, selling_price, quantity) -> dict[str, np.ndarray]:
+    """
+        charges of delivery trades, see DeliveryTransactionCost
+    """
+    charges = common_charges(buying_price, selling_price, quantity)
+    buying_price = np.asarray(buying_price, dtype=float)
+    selling_price = np.asarray(selling_price, dtype=float)
+
+    charges["brokerage_charges"] = np.zeros_like(charges["turnover"])
+    charges["stt_total"] = (0.1 / 100) * charges["turnover"]
+    charges["dp_charges"] = np.where(selling_price != 0, 15.93, 0.)
+    charges["stamp_duty"] = round_like_python((1500 / 10000000) * buying_price * quantity)
+    charges["gst"] = 0.18 * (charges["brokerage_charges"] + charges["net_transaction_charges"] + charges["sebi_charges"] / 1.18)
+    charges["total_tax_and_charges"] = charges["brokerage_charges"] + charges["stt_total"] + charges["net_transaction_charges"] + charges["dp_charges"] + charges["stamp_duty"] + charges["gst"] + charges["sebi_charges"]
+    charges["net_pl"] = charges["profit_or_loss"] - charges["total_tax_and_charges"]
+    return charges
+
+
+def intraday_charges(buying_price, selling_price, quantity) -> dict[str, np.ndarray]:
+    """
+        charges of intraday (MIS) trades, see IntradayTransactionCost
+    """
+    charges = common_charges(buying_price, selling_price, quantity)
+    buying_price = np.asarray(buying_price, dtype=float)
+    selling_price = np.asarray(selling_price, dtype=float)
+
+    brokerage = charges["turnover"] * (0.03 / 100)
+    charges["brokerage_charges"] = np.where(brokerage < 40, brokerage, 40.)
+    charges["stt_total"] = (0.025 / 100) * selling_price
+    charges["clearing_charges"] = np.zeros_like(charges["turnover"])
+    charges["stamp_duty"] = round_like_python((300 / 10000000) * buying_price * quantity)
+    charges["gst"] = 0.18 * (charges["brokerage_charges"] + charges["net_transaction_charges"] + charges["sebi_charges"] / 1.18)
+    charges["total_tax_and_charges"] = charges["brokerage_charges"] + charges["stt_total"] + charges["net_transaction_charges"] + charges["clearing_charges"] + charges["stamp_duty"] + charges["gst"] + charges["sebi_charges"]
+    charges["net_pl"] = charges["profit_or_loss"] - charges["total_tax_and_charges"]
+    return charges
@@ -1,3 +1,6 @@
+from models.costs.batch_cost import delivery_charges
+
+
 class DeliveryTransactionCost:
     """
         This class provides the details of all the transaction cost of any delivery charged by zerodha.
@@ -23,6 +26,10 @@ class DeliveryTransactionCost:
     total_tax_and_charges: float
     net_pl: float
 
+    __slots__ = ('buying_price', 'selling_price', 'quantity', 'brokerage_charges', 'profit_or_loss', 'turnover',
+                 'stt_total', 'net_transaction_charges', 'dp_charges', 'stamp_duty', 'sebi_charges', 'gst',
+                 'total_tax_and_charges', 'net_pl')
+
     def __init__(
             self,
             buying_price: float,
@@ -33,22 +40,11 @@ class DeliveryTransactionCost:
         self.selling_price = selling_price
         self.quantity = quantity
 
-        # setting the common variables
-        self.profit_or_loss = (self.selling_price - self.buying_price) * self.quantity
-        self.turnover = (self.buying_price + self.selling_price) * self.quantity
-
         self.equity_charges()
 
     def equity_charges(self):
         """
             Calculates each and every charges associated with the stock
         """
-        self.brokerage_charges = 0.0
-        self.stt_total = (0.1 / 100) * self.turnover
-        self.net_transaction_charges = round((0.00345 / 100) * self.turnover, 2)
-        self.dp_charges = 15.93 if self.selling_price != 0 else 0
-        self.stamp_duty = round((1500 / 10000000) * self.buying_price * self.quantity, 2)
-        self.sebi_charges = round(((self.turnover / 10000000) * 10) * 1.18, 2)
-        self.gst = 0.18 * (self.brokerage_charges + self.net_transaction_charges + self.sebi_charges / 1.18)
-        self.total_tax_and_charges = self.brokerage_charges + self.stt_total + self.net_transaction_charges + self.dp_charges + self.stamp_duty + self.gst + self.sebi_charges
-        self.net_pl = self.profit_or_loss - self.total_tax_and_charges
+        for name, value in delivery_charges(self.buying_price, self.selling_price, self.quantity).items():
+            setattr(self, name, float(value))
@@ -1,3 +1,6 @@
+from models.costs.batch_cost import intraday_charges
+
+
 class IntradayTransactionCost:
     """
         This class provides the details of all the transaction cost  of
@@ -24,6 +27,10 @@ class IntradayTransactionCost:
     total_tax_and_charges: float
     net_pl: float
 
+    __slots__ = ('buying_price', 'selling_price', 'quantity', 'brokerage_charges', 'profit_or_loss', 'turnover',
+                 'stt_total', 'net_transaction_charges', 'clearing_charges', 'stamp_duty', 'sebi_charges', 'gst',
+                 'total_tax_and_charges', 'net_pl')
+
     def __init__(
             self,
             buying_price: float,
@@ -34,22 +41,11 @@ class IntradayTransactionCost:
         self.selling_price = selling_price
         self.quantity = quantity
 
-        # setting the common variables
-        self.profit_or_loss = (self.selling_price - self.buying_price) * self.quantity
-        self.turnover = (self.buying_price + self.selling_price) * self.quantity
-
         self.equity_charges()
 
     def equity_charges(self):
         """
             Calculates each and every charges associated with the stock
         """
-        self.brokerage_charges = self.turnover * (0.03 / 100) if self.turnover * (0.03 / 100) < 40 else 40
-        self.stt_total = (0.025 / 100) * self.selling_price
-        self.net_transaction_charges = round((0.00345 / 100) * self.turnover, 2)
-        self.clearing_charges = 0
-        self.stamp_duty = round((300 / 10000000) * self.buying_price * self.quantity, 2)
-        self.sebi_charges = round(((self.turnover / 10000000) * 10) * 1.18, 2)
-        self.gst = 0.18 * (self.brokerage_charges + self.net_transaction_charges + self.sebi_charges / 1.18)
-        self.total_tax_and_charges = self.brokerage_charges + self.stt_total + self.net_transaction_charges + self.clearing_charges + self.stamp_duty + self.gst + self.sebi_charges
-        self.net_pl = self.profit_or_loss - self.total_tax_and_charges
+        for name, value in intraday_charges(self.buying_price, self.selling_price, self.quantity).items():
+            setattr(self, name, float(value))
@@ -0,0 +1,258 @@
+from math import nan
+
+import numpy as np
+
+from utils.indicators import kahan_add, kahan_remove, window_sum
+
+
+class IndicatorEngine:
+    """
+        Holds the live indicator state of all the tracked symbols in columnar numpy arrays.
+
+        Each symbol gets a row. On every tick the KAMA line, its ewm signal (along with the running minimum and the
+        last two returns of the signal used for buying), the high, the low and the lowest indicator price are updated
+        for all the symbols in one vectorised step. StockInfo objects only keep their row and read from here.
+
+        The rolling volatility is moved with the same steps as utils.indicators.rolling_sum, hence the KAMA line is
+        identical to kaufman_kernel over the whole history.
+    """
+
+    def __init__(self, n: int = 10, pow1: int = 2, pow2: int = 30, span: float = 10, capacity: int = 64) -> None:
+        self.n = n
+        self.fastest_sc, self.slowest_sc = 2 / (pow1 + 1), 2 / (pow2 + 1)
+        com = (span - 1) / 2.0
+        self.old_wt_factor = 1. - 1. / (1. + com)
+        self.new_wt = 1.
+
+        self.symbols: list[str] = []
+        self.__allocate(capacity)
+
+        # everything except the values read by the stock info, which are only set by live ticks
+        self.state_columns = [
+            name for name in self.columns
+            if name not in ('latest_price', 'latest_indicator_price', 'high', 'low', 'lowest_indicator')
+        ]
+
+    def __allocate(self, capacity: int) -> None:
+        """
+            allocates the arrays for the given number of rows keeping the rows which are already present
+        """
+        n = self.n
+        columns = {
+            # last n + 1 prices and last n absolute differences of every symbol
+            'prices': (np.float64, (n + 1,), nan),
+            'diffs': (np.float64, (n,), nan),
+            'tick_count': (np.int64, (), 0),
+            # rolling sum of the absolute differences, maintained the way pandas does it
+            'vol_nobs': (np.int64, (), 0),
+            'vol_sum': (np.float64, (), 0.),
+            'add_compensation': (np.float64, (), 0.),
+            'remove_compensation': (np.float64, (), 0.),
+            'same_diff_count': (np.int64, (), 0),
+            'last_diff': (np.float64, (), nan),
+            # KAMA line, the batch version starts from an array of zeros
+            'line': (np.float64, (), 0.),
+            'first_value': (np.bool_, (), True),
+            # ewm of the line
+            'ewm_started': (np.bool_, (), False),
+            'weighted': (np.float64, (), nan),
+            'old_wt': (np.float64, (), 1.),
+            'ewm_nobs': (np.int64, (), 0),
+            # signal, only over the steps where both the line and the signal are available
+            'signal_count': (np.int64, (), 0),
+            'signal': (np.float64, (), nan),
+            'previous_signal': (np.float64, (), nan),
+            'minimum_signal': (np.float64, (), nan),
+            'last_return': (np.float64, (), nan),
+            'previous_return': (np.float64, (), nan),
+            # values read by the stock info
+            'latest_price': (np.float64, (), nan),
+            'latest_indicator_price': (np.float64, (), nan),
+            'high': (np.float64, (), nan),
+            'low': (np.float64, (), nan),
+            'lowest_indicator': (np.float64, (), nan),
+        }
+        self.columns = list(columns.keys())
+        size = len(self.symbols)
+        for name, (dtype, shape, fill) in columns.items():
+            column = np.full((capacity,) + shape, fill, dtype=dtype)
+            if size:
+                column[:size] = getattr(self, name)[:size]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def register(self, symbol: str) -> int:
+        """
+            adds a row for the symbol and returns it
+        """
+        if len(self.symbols) == self.capacity:
+            self.__allocate(2 * self.capacity)
+        self.symbols.append(symbol)
+        return len(self.symbols) - 1
+
+    def update_indicators(self, rows: np.ndarray, prices: np.ndarray) -> None:
+        """
+            adds one price to each of the rows and updates the KAMA line and the signal, a row can appear only once
+        """
+        n = self.n
+        count = self.tick_count[rows]
+
+        # absolute difference with the previous price
+        previous_price = self.prices[rows, (count - 1) % (n + 1)]
+        diff = np.where(count > 0, np.abs(prices - previous_price), nan)
+
+        # the difference leaving the window is removed from the rolling sum
+        slot = count % n
+        removed = self.diffs[rows, slot]
+        observed = (count >= n) & (removed == removed)
+        vol_sum, self.remove_compensation[rows] = kahan_remove(
+            self.vol_sum[rows], self.remove_compensation[rows], removed, observed
+        )
+        self.vol_nobs[rows] -= observed
+
+        # and the new one is added
+        observed = diff == diff
+        vol_sum, self.add_compensation[rows], self.same_diff_count[rows], self.last_diff[rows] = kahan_add(
+            vol_sum, self.add_compensation[rows], self.same_diff_count[rows], self.last_diff[rows], diff, observed
+        )
+        self.vol_sum[rows] = vol_sum
+        self.vol_nobs[rows] += observed
+        self.diffs[rows, slot] = diff
+
+        self.prices[rows, count % (n + 1)] = prices
+        count = count + 1
+        self.tick_count[rows] = count
+
+        vol = window_sum(vol_sum, self.vol_nobs[rows], self.same_diff_count[rows], self.last_diff[rows], n)
+        oldest_price = self.prices[rows, count % (n + 1)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            er = np.where(count > n, np.abs(prices - oldest_price) / vol, nan)
+        sc = (er * (self.fastest_sc - self.slowest_sc) + self.slowest_sc) ** 2.0
+
+        # if volatility is 0 it turns out to be nan so is considered separately
+        line = self.line[rows]
+        first_value = self.first_value[rows]
+        zero_vol = vol == 0
+        valid = ~zero_vol & (sc == sc)
+        line = np.where(
+            zero_vol,
+            line + 1 * (prices - line),
+            np.where(valid, np.where(first_value, prices, line + sc * (prices - line)), nan)
+        )
+        self.line[rows] = line
+        self.first_value[rows] = first_value & ~valid
+
+        # ewm of the line
+        started = self.ewm_started[rows]
+        weighted = self.weighted[rows]
+        old_wt = self.old_wt[rows]
+        is_observation = line == line
+        carried = started & (weighted == weighted)
+        old_wt = np.where(carried, old_wt * self.old_wt_factor, old_wt)
+        blended = (old_wt * weighted + self.new_wt * line) / (old_wt + self.new_wt)
+        weighted = np.where(
+            ~started,
+            line,
+            np.where(
+                carried,
+                # avoid numerical errors on constant series
+                np.where(is_observation & (weighted != line), blended, weighted),
+                np.where(is_observation, line, weighted)
+            )
+        )
+        self.old_wt[rows] = np.where(carried & is_observation, old_wt + self.new_wt, old_wt)
+        self.weighted[rows] = weighted
+        self.ewm_started[rows] = True
+        ewm_nobs = self.ewm_nobs[rows] + is_observation
+        self.ewm_nobs[rows] = ewm_nobs
+        signal = np.where(ewm_nobs >= 1, weighted, nan)
+
+        # returns and minimum of the signal over the steps where the line and signal are available
+        available = is_observation & (signal == signal)
+        previous_signal = self.signal[rows]
+        last_return = self.last_return[rows]
+        minimum_signal = self.minimum_signal[rows]
+        signal_count = self.signal_count[rows]
+        # same as pct_change() + 1
+        new_return = np.where(signal_count > 0, (signal / previous_signal - 1) + 1, nan)
+        self.previous_return[rows] = np.where(available, last_return, self.previous_return[rows])
+        self.last_return[rows] = np.where(available, new_return, last_return)
+        self.previous_signal[rows] = np.where(available, previous_signal, self.previous_signal[rows])
+        self.signal[rows] = np.where(available, signal, previous_signal)
+        self.minimum_signal[rows] = np.where(
+            available & ((minimum_signal != minimum_signal) | (signal < minimum_signal)),
+            signal,
+            minimum_signal
+        )
+        self.signal_count[rows] = signal_count + available
+
+    def update(self, rows: np.ndarray, prices: np.ndarray) -> None:
+        """
+            processes the latest price of each row for the tick
+        """
+        self.update_indicators(rows, prices)
+        self.latest_price[rows] = prices
+        latest_indicator_price = self.signal[rows]
+        self.latest_indicator_price[rows] = latest_indicator_price
+
+        low, high = self.low[rows], self.high[rows]
+        self.low[rows] = np.where((low != low) | (low > prices), prices, low)
+        self.high[rows] = np.where((high != high) | (high < prices), prices, high)
+
+        lowest_indicator = self.lowest_indicator[rows]
+        self.lowest_indicator[rows] = np.where(
+            (lowest_indicator != lowest_indicator) | (lowest_indicator > latest_indicator_price),
+            latest_indicator_price,
+            lowest_indicator
+        )
+
+    def replay(self, rows: list[int], histories: list[np.ndarray]) -> None:
+        """
+            feeds the earlier prices of the rows to the indicators, all the rows are moved one step at a time
+        """
+        if not rows:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = np.array([len(history) for history in histories])
+        padded = np.full((len(rows), lengths.max(initial=0)), nan)
+        for index, history in enumerate(histories):
+            padded[index, :len(history)] = history
+        for step in range(padded.shape[1]):
+            active = lengths > step
+            self.update_indicators(rows[active], padded[active, step])
+
+    def state(self, row: int) -> dict[str, np.ndarray]:
+        """
+            returns the indicator state of the row, which is all that is needed to carry on without the earlier prices
+        """
+        return {name: np.array(getattr(self, name)[row]) for name in self.state_columns}
+
+    def load_state(self, row: int, state: dict[str, np.ndarray]) -> bool:
+        """
+            restores the indicator state of the row, returns False if the state does not fit the engine
+        """
+        for name in self.state_columns:
+            if name not in state or state[name].shape != getattr(self, name)[row].shape:
+                return False
+        for name in self.state_columns:
+            getattr(self, name)[row] = state[name]
+        return True
+
+    def has_reversed(self, row: int) -> bool:
+        """
+            True if the signal was falling till the previous step which was also its lowest point, and now it rises
+        """
+        return bool(self.signal_count[row] > 1 and self.previous_return[row] < 1 <= self.last_return[row] and np.round(
+            self.previous_signal[row], 2) == np.round(self.minimum_signal[row], 2))
+
+    def value(self, name: str, row: int | None) -> float | None:
+        """
+            returns the value of the column for the row, None if it is not available
+        """
+        if row is None:
+            return None
+        value = getattr(self, name)[row]
+        return None if value != value else float(value)
+
+
+indicator_engine = IndicatorEngine()
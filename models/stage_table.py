@@ -0,0 +1,241 @@
+from datetime import date, datetime
+from logging import INFO, Logger
+from math import nan
+
+import numpy as np
+
+from constants.enums.position_type import PositionType
+from models.costs.batch_cost import delivery_charges, intraday_charges
+from models.indicator_engine import indicator_engine
+from models.stock_info import StockInfo
+from models.stock_stage import Stage
+from models.trigger_ladder import highest_steps_below, ladder_levels
+from services.checkpoint import checkpoint_queue
+from utils.logger import get_logger
+
+logger: Logger = get_logger(__name__)
+
+
+class StageTable:
+    """
+        Columnar copy of the open positions and holdings of the account, in which the breach of all of them is detected
+        and their triggers are ratcheted in one vectorised step per tick. This is the only place where the triggers are
+        set.
+
+        Only the long stages with a price are evaluated. A stage is breached when its price falls below
+        trigger / (1 + incremental return / 2), or, before it has a trigger, when the indicator price falls below the
+        position price. Otherwise its trigger is raised to the highest level of the trigger ladder
+        (models/trigger_ladder.py) below the price, if that is above the earlier trigger. The levels are computed from the cost
+            cost = position price + transaction cost / quantity
+        where the transaction cost is the delivery cost if the stock has been held for more than a day and the
+        intraday cost otherwise.
+
+        The trigger of a stage is kept here while it is open and copied back to the stage whenever it changes. The
+        expected return and whether the delivery charges apply only change with the day, so they are refreshed when
+        the day rolls over. The wallet of a stock changes when one of its stages is sold, after which wallet_changed
+        refreshes the wallet share of its other stages.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.stages: list[Stage] = []
+        self.rows: dict[int, int] = {}  # id of the stage -> its row
+        self.day: date | None = None
+        self.__allocate(capacity)
+
+    def __allocate(self, capacity: int) -> None:
+        """
+            allocates the arrays for the given number of rows keeping the rows which are already present
+        """
+        columns = {
+            'stock_row': (np.int64, 0),
+            'long': (np.bool_, False),
+            'position_price': (np.float64, nan),
+            'quantity': (np.int64, 0),
+            'trigger': (np.float64, nan),
+            'last_price': (np.float64, nan),
+            'wallet_share': (np.float64, 0.),
+            'incremental_return': (np.float64, 0.),
+            'expected_return': (np.float64, 0.),
+            'delivery': (np.bool_, False),
+        }
+        self.columns = list(columns.keys())
+        size = len(self.stages)
+        for name, (dtype, fill) in columns.items():
+            column = np.full(capacity, fill, dtype=dtype)
+            if size:
+                column[:size] = getattr(self, name)[:size]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def __load(self, row: int) -> None:
+        stage = self.stages[row]
+        self.stock_row[row] = stage.stock.row
+        self.long[row] = stage.position_type == PositionType.LONG
+        self.position_price[row] = stage.position_price
+        self.quantity[row] = stage.quantity
+        self.trigger[row] = nan if stage.trigger is None else stage.trigger
+        self.last_price[row] = nan if stage.last_price is None else stage.last_price
+        self.incremental_return[row] = stage.incremental_return
+        self.__load_daily(row)
+
+    def __load_daily(self, row: int) -> None:
+        stage = self.stages[row]
+        self.__load_wallet_share(row)
+        self.expected_return[row] = stage.current_expected_return
+        self.delivery[row] = stage.number_of_days > 1
+
+    def __load_wallet_share(self, row: int) -> None:
+        stage = self.stages[row]
+        self.wallet_share[row] = stage.stock.wallet / stage.quantity
+
+    def wallet_changed(self, stock: StockInfo) -> None:
+        """
+            refreshes the wallet share of the stages of the stock, once the sale of one of its stages has been booked
+        """
+        for row, stage in enumerate(self.stages):
+            if stage.stock is stock:
+                self.__load_wallet_share(row)
+
+    def add(self, stage: Stage) -> None:
+        if len(self.stages) == self.capacity:
+            self.__allocate(2 * self.capacity)
+        self.rows[id(stage)] = len(self.stages)
+        self.stages.append(stage)
+        self.__load(len(self.stages) - 1)
+
+    def remove(self, stage: Stage) -> None:
+        """
+            the last row is moved in place of the removed one
+        """
+        row = self.rows.pop(id(stage))
+        last = len(self.stages) - 1
+        if row != last:
+            moved = self.stages[last]
+            self.stages[row] = moved
+            self.rows[id(moved)] = row
+            for name in self.columns:
+                column = getattr(self, name)
+                column[row] = column[last]
+        self.stages.pop()
+
+    def sync(self, stages: list[Stage]) -> None:
+        """
+            adds the stages which have been opened and removes the ones which are no longer open.
+            A stage is added only once its stock is linked and has received a price.
+        """
+        open_stages = {id(stage): stage for stage in stages if stage.stock is not None and stage.stock.row is not None}
+        for stage in [stage for stage in self.stages if id(stage) not in open_stages]:
+            self.remove(stage)
+        for key, stage in open_stages.items():
+            if key not in self.rows:
+                self.add(stage)
+
+    def rows_of(self, symbols: set[str] | None = None) -> np.ndarray:
+        if symbols is None:
+            return np.arange(len(self.stages))
+        return np.array([row for row, stage in enumerate(self.stages) if stage.stock.stock_name in symbols], dtype=np.int64)
+
+    def evaluate(self, rows: np.ndarray) -> list[Stage]:
+        """
+            returns the stages which are breached and ratchets the triggers of the others
+        """
+        today = datetime.now().date()
+        if self.day != today:
+            for row in range(len(self.stages)):
+                self.__load_daily(row)
+            self.day = today
+
+        if rows.size == 0:
+            return []
+
+        stock_rows = self.stock_row[rows]
+        latest_price = indicator_engine.latest_price[stock_rows]
+        last_price = np.where((latest_price == latest_price) & (latest_price != 0), latest_price, self.last_price[rows])
+        self.last_price[rows] = last_price
+
+        # only the long stages with a price are evaluated
+        active = self.long[rows] & (last_price == last_price)
+        trigger = self.trigger[rows]
+        position_price = self.position_price[rows]
+        incremental_return = self.incremental_return[rows]
+        indicator_price = indicator_engine.latest_indicator_price[stock_rows]
+        with np.errstate(invalid='ignore'):
+            breached = active & np.where(
+                trigger == trigger,
+                last_price < trigger / (1 + (incremental_return / 2)),
+                (indicator_price == indicator_price) & (indicator_price != 0) & (indicator_price < position_price)
+            )
+
+        ratchet = active & ~breached
+        if ratchet.any():
+            self.__ratchet(rows[ratchet])
+        if logger.isEnabledFor(INFO):
+            self.__log(rows[active], trigger[active], breached[active])
+
+        breached_rows = rows[breached]
+        for row in breached_rows:
+            self.stages[row].last_price = float(self.last_price[row])
+        return [self.stages[row] for row in breached_rows]
+
+    def __costs(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+            returns the transaction cost of selling the stages at their last price, and their cost per share
+        """
+        buy_price, selling_price, quantity = self.position_price[rows], self.last_price[rows], self.quantity[rows]
+        total_cost = np.where(
+            self.delivery[rows],
+            delivery_charges(buy_price, selling_price, quantity)["total_tax_and_charges"],
+            intraday_charges(buy_price, selling_price, quantity)["total_tax_and_charges"]
+        )
+        return total_cost, buy_price + total_cost / quantity
+
+    def __ratchet(self, rows: np.ndarray) -> None:
+        """
+            sets the trigger to the highest level below the last price if it is above the earlier trigger
+        """
+        selling_price = self.last_price[rows]
+        _, cost = self.__costs(rows)
+
+        wallet_share, expected_return = self.wallet_share[rows], self.expected_return[rows]
+        incremental_return = self.incremental_return[rows]
+        steps = highest_steps_below(cost, wallet_share, selling_price, expected_return, incremental_return)
+        levels = ladder_levels(steps, cost, wallet_share, expected_return, incremental_return)
+
+        earlier_trigger = self.trigger[rows]
+        trigger = np.where(steps > 0, np.fmax(earlier_trigger, levels), earlier_trigger)
+        self.trigger[rows] = trigger
+
+        for row in rows[(trigger == trigger) & ~(trigger == earlier_trigger)]:
+            stage = self.stages[row]
+            stage.trigger = float(self.trigger[row])
+            checkpoint_queue.mark(stage)
+            logger.info(f"trigger for {stage.stock.stock_name} is {stage.trigger}, latest price:{self.last_price[row]}")
+
+    def __log(self, rows: np.ndarray, earlier_trigger: np.ndarray, breached: np.ndarray) -> None:
+        """
+            logs the earlier trigger of the evaluated stages and, for the ones which are not breached, the cost and the
+            returns their trigger is computed from, the same lines a stage logged when it was evaluated on its own
+        """
+        ratchet = rows[~breached]
+        total_cost, cost = self.__costs(ratchet)
+        wallet_share, expected_return = self.wallet_share[ratchet], self.expected_return[ratchet]
+        first_level = ladder_levels(
+            np.ones(ratchet.size, dtype=np.int64), cost, wallet_share, expected_return, self.incremental_return[ratchet]
+        )
+        ratchet_index = {row: index for index, row in enumerate(ratchet)}
+
+        for row, trigger in zip(rows, earlier_trigger):
+            stage = self.stages[row]
+            stock_name = stage.stock.stock_name
+            earlier = None if trigger != trigger else float(trigger)
+            logger.info(f"{stock_name} Earlier trigger:  {earlier}, latest price:{float(self.last_price[row])}")
+            if row not in ratchet_index:
+                continue
+            index = ratchet_index[row]
+            logger.info(f"{stage.number_of_days}")
+            logger.info(f"the total transaction cost for {stock_name} is {float(total_cost[index])}")
+            logger.info(f"current : {float(expected_return[index])}")
+            logger.info(f"cost tracking {float(first_level[index])}")
+            if self.trigger[row] == self.trigger[row] and self.trigger[row]:
+                current_return = (self.trigger[row] / (cost[index] - wallet_share[index])) - 1
+                logger.info(f"current return for {stock_name} is  {float(current_return)}")
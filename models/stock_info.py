@@ -1,22 +1,20 @@
 from logging import Logger
-from time import sleep
-from typing import Any
-from datetime import datetime
-
-import requests
+from datetime import datetime, time
 
 import pandas as pd
 import numpy as np
 
-from constants.global_contexts import kite_context
-from constants.settings import set_end_process
+from constants.settings import INDICATOR_SNAPSHOT_INTERVAL, set_end_process
 from utils.logger import get_logger
-from utils.nr_db import connect_to_collection
+from utils.repository import Persistent
+from models.indicator_engine import indicator_engine
+from utils.indicators import kaufman_kernel
+from utils.tick_journal import append_ticks, read_snapshot, read_ticks, save_snapshot
 
 logger: Logger = get_logger(__name__)
 
 
-class StockInfo:
+class StockInfo(Persistent):
     """
         Given a symbol and exchange it holds all the information related to the stock.
 
@@ -30,6 +28,12 @@ class StockInfo:
     """
 
     COLLECTION_NAME = 'stock'
+    PROJECTION = {'_id': 0, 'symbol': 1, 'exchange': 1, 'wallet': 1, 'created_at': 1}
+    # only the wallet of a stock which is already in the db is updated
+    INSERT_ONLY_FIELDS = ('symbol', 'exchange', 'created_at')
+
+    __slots__ = ('symbol', 'exchange', 'wallet', 'stock_name', 'created_at', '__unsaved_prices', '__unsaved_timestamps',
+                 '__saved_ticks', '__snapshot_ticks', 'return_trace', 'row')
 
     def __init__(self, symbol: str = None, exchange: str = 'NSE', wallet: float = 0, created_at=datetime.now(),
                  **args) -> None:
@@ -39,17 +43,37 @@ class StockInfo:
         self.stock_name = symbol
         self.created_at = created_at
 
-        self.latest_price = None
-        self.latest_indicator_price = None
-
-        self.__result_stock_df: pd.DataFrame | None = None
+        # prices are appended to the tick journal by save_prices, only the ones not yet saved are kept in memory.
+        # The indicators carry the history forward
+        self.__unsaved_prices: list[float] = []
+        self.__unsaved_timestamps: list[float] = []
+        # number of ticks in the journal and in the journal when the indicator state was last saved
+        self.__saved_ticks = 0
+        self.__snapshot_ticks = 0
         self.return_trace = None
 
-        self.high = None
-        self.low = None
-        self.lowest_indicator = None
+        # the indicators are held by the indicator engine, the row is assigned when the first price arrives
+        self.row: int | None = None
+
+    @property
+    def latest_price(self) -> float | None:
+        return indicator_engine.value('latest_price', self.row)
+
+    @property
+    def latest_indicator_price(self) -> float | None:
+        return indicator_engine.value('latest_indicator_price', self.row)
 
-        self.first_buy = True
+    @property
+    def high(self) -> float | None:
+        return indicator_engine.value('high', self.row)
+
+    @property
+    def low(self) -> float | None:
+        return indicator_engine.value('low', self.row)
+
+    @property
+    def lowest_indicator(self) -> float | None:
+        return indicator_engine.value('lowest_indicator', self.row)
 
     def json(self):
         """
@@ -74,95 +98,108 @@ class StockInfo:
             created_at=json_data['created_at']
         )
 
-    @property
-    def current_price(self):
-        """
-            returns the current price in the market or else None if the connection interrupts
-
-            tries 4 times
-        """
-        retries = 0
-        while retries < 4:
-            try:
-                current_price = kite_context.ltp([f"{self.exchange}:{self.stock_name}"])[f"{self.exchange}:{self.stock_name}"]["last_price"]
-                if current_price is not None:
-                    return float(current_price)
-                # response = requests.get(f"http://127.0.0.1:8082/price?symbol={self.stock_name}")
-                # return response.json()['data']
-            except:
-                sleep(1)
-            retries += 1
-        return None
-
-    def update_price(self):
+    def update_price(self, current_price: float | None):
         """
         This is required to update the latest price.
 
-        It is used to update the csv containing the price for the stock.
+        It is used to update the prices held for the stock.
         Using it, it updates the latest indicator price which is the last KAMA indicator price.
 
         The latest KAMA indicator price is used while selling
 
+        :param current_price: price fetched for the whole universe in one go (see services.price_feed),
+            None if it could not be fetched
+        :return: None
+        """
+        self.update_prices([self], [current_price])
+
+    @classmethod
+    def update_prices(cls, stocks: list['StockInfo'], current_prices: list[float | None]):
+        """
+        Updates the latest price of all the stocks, the indicators of all of them are updated together
+        in one step of the indicator engine.
+
+        If the current price of a stock is None, its older latest price is used if it's not None
+
+        :param stocks:
+        :param current_prices: price of each stock, None if it could not be fetched
         :return: None
         """
-        current_price = self.current_price
-        if current_price == 'ENDED':
+        if 'ENDED' in current_prices:
             set_end_process(True)
             return
-        # if current price is still none in that case older latest price is used if it's not None
-        if current_price is not None:
-            self.latest_price = current_price
-        if self.latest_price is not None:
-            self.update_stock_df(self.latest_price)
-            actual_price: pd.DataFrame = self.__result_stock_df.copy()
-            kuafman_array = self.kaufman_indicator(actual_price['price'])
-            actual_price.loc[:, 'line'] = kuafman_array
-            actual_price.loc[:, 'signal'] = actual_price.line.ewm(span=10).mean()
-            actual_price.dropna(inplace=True)
-            actual_price.reset_index(inplace=True)
-            if actual_price.shape[0] == 0:
-                self.latest_indicator_price = None
-            else:
-                recent_price = actual_price.signal.iloc[actual_price.shape[0] - 1]
-                self.latest_indicator_price = recent_price
-
-            if self.low is None:
-                self.low = self.latest_price
-            else:
-                if self.low > self.latest_price:
-                    self.low = self.latest_price
-
-            if self.high is None:
-                self.high = self.latest_price
-            else:
-                if self.high < self.latest_price:
-                    self.high = self.latest_price
-
-            if self.lowest_indicator is None:
-                self.lowest_indicator = self.latest_indicator_price
-            else:
-                if self.lowest_indicator > self.latest_indicator_price:
-                    self.lowest_indicator = self.latest_indicator_price
-
-    def update_stock_df(self, current_price: float):
+
+        # stocks receiving their first price are registered, their indicators are restored from the snapshot and the
+        # earlier prices received after it are fed to them
+        new_stocks = [stock for stock in stocks if stock.row is None]
+        for stock in new_stocks:
+            stock.row = indicator_engine.register(stock.stock_name)
+        indicator_engine.replay([stock.row for stock in new_stocks], [stock.load_prices() for stock in new_stocks])
+
+        rows, prices = [], []
+        for stock, current_price in zip(stocks, current_prices):
+            price = current_price if current_price is not None else stock.latest_price
+            if price is not None:
+                stock.buffer_price(price)
+                rows.append(stock.row)
+                prices.append(price)
+        if rows:
+            indicator_engine.update(np.array(rows, dtype=np.int64), np.array(prices, dtype=np.float64))
+
+    def load_prices(self) -> np.ndarray:
+        """
+        Maps the tick journal which holds the price every 30 sec. It is read only once, when the first price arrives.
+
+        If a snapshot of the indicators is available it is restored, so only the prices received after it have to be
+        fed to the indicators. Otherwise, all the prices have to be fed.
+
+        :return: the prices which were saved earlier and are yet to be fed to the indicators
         """
-        This function updates the csv file which holds the price every 30 sec
+        ticks = read_ticks(self.stock_name)
+        prices = ticks['price']
+
+        # on a restart during the session the high and the low of the day are restored from the ticks received today
+        today = ticks['timestamp'] >= datetime.combine(datetime.now().date(), time()).timestamp()
+        if today.any():
+            indicator_engine.high[self.row] = prices[today].max()
+            indicator_engine.low[self.row] = prices[today].min()
+
+        self.__saved_ticks = len(prices)
+
+        snapshot = read_snapshot(self.stock_name)
+        if snapshot is not None and snapshot[0] <= len(prices) and indicator_engine.load_state(self.row, snapshot[1]):
+            self.__snapshot_ticks = snapshot[0]
+            return prices[snapshot[0]:]
+        self.__snapshot_ticks = 0
+        return prices
+
+    def buffer_price(self, current_price: float):
+        """
+        This function holds the price, along with the time it was received, till save_prices writes it to the tick
+        journal, so a tick costs the same irrespective of the history.
         :param current_price:
         :return: None
         """
-        try:
-            self.__result_stock_df = pd.read_csv(f"temp/{self.stock_name}.csv")
-            self.__result_stock_df.drop(self.__result_stock_df.columns[0], axis=1, inplace=True)
-        except FileNotFoundError:
-            self.__result_stock_df = None
-        stock_df = pd.DataFrame({"price": [current_price]})
-        if self.__result_stock_df is not None:
-            self.__result_stock_df = pd.concat([self.__result_stock_df, stock_df], ignore_index=True)
-        else:
-            self.__result_stock_df = stock_df
-        self.__result_stock_df.to_csv(f"temp/{self.stock_name}.csv")
-        self.__result_stock_df = self.__result_stock_df.fillna(method='bfill').fillna(method='ffill')
-        self.__result_stock_df.dropna(axis=1, inplace=True)
+        self.__unsaved_prices.append(current_price)
+        self.__unsaved_timestamps.append(datetime.now().timestamp())
+
+    def save_prices(self):
+        """
+            appends the prices which have not yet been saved to the tick journal.
+
+            It is called after the tick has been processed so that the disk io stays out of the decision path.
+            Every INDICATOR_SNAPSHOT_INTERVAL ticks the state of the indicators is saved as well.
+        """
+        if not self.__unsaved_prices:
+            return
+        append_ticks(self.stock_name, self.__unsaved_timestamps, self.__unsaved_prices)
+        self.__saved_ticks += len(self.__unsaved_prices)
+        self.__unsaved_prices = []
+        self.__unsaved_timestamps = []
+
+        if self.__saved_ticks - self.__snapshot_ticks >= INDICATOR_SNAPSHOT_INTERVAL:
+            save_snapshot(self.stock_name, self.__saved_ticks, indicator_engine.state(self.row))
+            self.__snapshot_ticks = self.__saved_ticks
 
     @staticmethod
     def kaufman_indicator(price: pd.Series, n=10, pow1=2, pow2=30):
@@ -175,30 +212,7 @@ class StockInfo:
         :param pow2: slowest period
         :return:
         """
-        abs_diffx = abs(price - price.shift(1))
-        abs_price_change = np.abs(price - price.shift(n))
-        vol = abs_diffx.rolling(n).sum()
-        er = abs_price_change / vol
-        fastest_sc, slowest_sc = 2 / (pow1 + 1), 2 / (pow2 + 1)
-
-        sc = (er * (fastest_sc - slowest_sc) + slowest_sc) ** 2.0
-
-        answer = np.zeros(sc.size)
-        n = len(answer)
-        first_value = True
-        for i in range(n):
-            # if volatility is 0 it turns out to be nan so is considered separately
-            if vol[i] == 0:
-                answer[i] = answer[i - 1] + 1 * (price[i] - answer[i - 1])
-            elif sc[i] != sc[i]:
-                answer[i] = np.nan
-            else:
-                if first_value:
-                    answer[i] = price[i]
-                    first_value = False
-                else:
-                    answer[i] = answer[i - 1] + sc[i] * (price[i] - answer[i - 1])
-        return answer
+        return kaufman_kernel(price.to_numpy(dtype=float), n=n, pow1=pow1, pow2=pow2)
 
     def whether_buy(self) -> bool:
         """
@@ -216,85 +230,20 @@ class StockInfo:
         :return:
         """
 
-        # a. buying for sudden fall
-        if False:
-            actual_price = self.__result_stock_df.copy()
-            actual_price.dropna(inplace=True)
-            actual_price.reset_index(inplace=True)
-            returns = actual_price.pct_change() + 1
-            counter = 0
-            for step in range(returns.shape[0] - 1, -1, -1):
-                if returns.iloc[step].price >= 1:
-                    counter += 1
-                else:
-                    break
-            if counter > 4:
-                self.first_buy = False
-                return True
-        else:
-            actual_price = self.__result_stock_df.copy()
-            kuafman_array = self.kaufman_indicator(actual_price['price'])
-            actual_price.loc[:, 'line'] = kuafman_array
-            actual_price.loc[:, 'signal'] = actual_price.line.ewm(span=10).mean()
-            actual_price.dropna(inplace=True)
-            actual_price.reset_index(inplace=True)
-            returns = actual_price.pct_change() + 1
-
-            if actual_price.shape[0] > 1:
-                last_step = actual_price.shape[0] - 1
-                if returns.signal.iloc[last_step - 1] < 1 <= returns.signal.iloc[last_step] and round(
-                        actual_price.signal.iloc[last_step - 1], 2) == round(actual_price.signal.min(), 2):
-                    logger.info(f"stock: {self.stock_name}, index: {last_step} ,actual buy")
-                    self.return_trace = returns.signal.iloc[last_step]
-                if self.return_trace:
-                    self.return_trace *= returns.signal.iloc[-1]
-                    if self.return_trace > 1.001:
-                        logger.info(
-                            f"stock: {self.stock_name}, index: {actual_price.shape[0] - 1} ,actual buy")
-                        self.return_trace = None
-                        return True
+        # the indicator engine holds the ewm of the KAMA line along with its minimum and last two returns
+        signal_count = int(indicator_engine.signal_count[self.row]) if self.row is not None else 0
+
+        if signal_count > 1:
+            last_step = signal_count - 1
+            last_return = float(indicator_engine.last_return[self.row])
+            if indicator_engine.has_reversed(self.row):
+                logger.info(f"stock: {self.stock_name}, index: {last_step} ,actual buy")
+                self.return_trace = last_return
+            if self.return_trace:
+                self.return_trace *= last_return
+                if self.return_trace > 1.001:
+                    logger.info(
+                        f"stock: {self.stock_name}, index: {signal_count - 1} ,actual buy")
+                    self.return_trace = None
+                    return True
         return False
-
-    @classmethod
-    async def find_by_name(cls, search_dict):
-        """
-            This function is used to find a collection by trade symbol
-        """
-        with connect_to_collection(cls.COLLECTION_NAME) as collection:
-            data = await collection.find_one(search_dict)
-            return cls.to_object(data) if data else None
-
-    async def save_to_db(self):
-        """
-            function to insert the object into the database
-        """
-        with connect_to_collection(self.COLLECTION_NAME) as collection:
-            await collection.insert_one(self.json())
-
-    @classmethod
-    async def retrieve_all_services(cls):
-        """
-            If limit or skip is provided then it provides that many element
-            Otherwise it provides total list of document
-        """
-        document_list = []
-        with connect_to_collection(cls.COLLECTION_NAME) as collection:
-            cursor = collection.find({})
-            async for document in cursor:
-                document_list.append(cls.to_object(document))
-        return document_list
-
-    async def delete_from_db(self, search_dict):
-        """
-            This function is used to delete the document from collection
-        """
-        with connect_to_collection(self.COLLECTION_NAME) as collection:
-            await collection.delete_one(search_dict)
-
-    @classmethod
-    async def update_in_db(cls, search_dict, data: dict[str, Any]):
-        """
-            This function is used to update fields of banner
-        """
-        with connect_to_collection(cls.COLLECTION_NAME) as collection:
-            await collection.update_one(search_dict, {'$set': data})
@@ -1,4 +1,4 @@
-from typing import Any
+from datetime import datetime
 
 from models.stock_stage import Stage
 from models.stock_info import StockInfo
@@ -7,11 +7,18 @@ from constants.enums.position_type import PositionType
 from constants.enums.product_type import ProductType
 
 from constants.settings import DELIVERY_INCREMENTAL_RETURN
-from utils.nr_db import connect_to_collection
+from utils.repository import Persistent
 
 
-class Holding(Stage):
+class Holding(Stage, Persistent):
     COLLECTION_NAME = 'holding'
+    PROJECTION = {
+        '_id': 0, 'buy_price': 1, 'position_price': 1, 'quantity': 1, 'product_type': 1, 'position_type': 1, 'symbol': 1,
+        'trigger': 1, 'checkpointed_at': 1
+    }
+    TIMESTAMP_FIELD = 'checkpointed_at'
+
+    __slots__ = ('symbol',)
 
     def __init__(
             self,
@@ -48,7 +55,9 @@ class Holding(Stage):
             "quantity": self.quantity,
             "product_type": self.product_type.value,
             "position_type": self.position_type.value,
-            "symbol": self.symbol
+            "symbol": self.symbol,
+            "trigger": self.trigger,
+            "checkpointed_at": datetime.now()
         }
 
     @classmethod
@@ -63,49 +72,4 @@ class Holding(Stage):
             product_type=ProductType(json_data['product_type']),
             position_type=PositionType(json_data['position_type']),
             symbol=json_data['symbol']
-        )
-
-    @classmethod
-    async def find_by_name(cls, search_dict):
-        """
-            This function is used to find a collection by trade symbol
-        """
-        with connect_to_collection(cls.COLLECTION_NAME) as collection:
-            data = await collection.find_one(search_dict)
-            return cls.to_object(data) if data else None
-
-    async def save_to_db(self):
-        """
-            function to insert the object into the database
-        """
-        with connect_to_collection(self.COLLECTION_NAME) as collection:
-            await collection.insert_one(self.json())
-
-    @classmethod
-    async def retrieve_all_services(cls):
-        """
-            If limit or skip is provided then it provides that many element
-            Otherwise it provides total list of document
-        """
-        document_list = []
-        with connect_to_collection(cls.COLLECTION_NAME) as collection:
-            cursor = collection.find({})
-            async for document in cursor:
-                document_list.append(cls.to_object(document))
-            return document_list
-
-    async def delete_from_db(self, search_dict):
-        """
-            This function is used to delete the document from collection
-        """
-        with connect_to_collection(self.COLLECTION_NAME) as collection:
-            await collection.delete_one(search_dict)
-
-    @classmethod
-    async def update_in_db(cls, search_dict, data: dict[str, Any]):
-        """
-            This function is used to update fields of banner
-        """
-        with connect_to_collection(cls.COLLECTION_NAME) as collection:
-            await collection.update_one(search_dict, {'$set': data})
-
+        ).restore_trigger(json_data)
@@ -1,13 +1,23 @@
+from datetime import datetime
+
 from models.stock_stage import Stage
 from models.stock_info import StockInfo
 
 from constants.enums.position_type import PositionType
 from constants.enums.product_type import ProductType
 from constants.settings import INTRADAY_INCREMENTAL_RETURN
+from utils.repository import Persistent
 
 
-class Position(Stage):
+class Position(Stage, Persistent):
     COLLECTION_NAME = 'position'
+    PROJECTION = {
+        '_id': 0, 'buy_price': 1, 'position_price': 1, 'quantity': 1, 'product_type': 1, 'position_type': 1, 'symbol': 1,
+        'trigger': 1, 'checkpointed_at': 1
+    }
+    TIMESTAMP_FIELD = 'checkpointed_at'
+
+    __slots__ = ('symbol',)
 
     def __init__(
             self,
@@ -31,3 +41,32 @@ class Position(Stage):
     @property
     def incremental_return(self):
         return INTRADAY_INCREMENTAL_RETURN
+
+    def json(self):
+        """
+            This function is used to structure the data so that it can be added in the database
+        """
+        return {
+            "buy_price": self.buy_price,
+            "position_price": self.position_price,
+            "quantity": self.quantity,
+            "product_type": self.product_type.value,
+            "position_type": self.position_type.value,
+            "symbol": self.symbol,
+            "trigger": self.trigger,
+            "checkpointed_at": datetime.now()
+        }
+
+    @classmethod
+    def to_object(cls, json_data):
+        """
+            This function is used to convert to object
+        """
+        return cls(
+            buy_price=json_data['buy_price'],
+            position_price=json_data['position_price'],
+            quantity=json_data['quantity'],
+            product_type=ProductType(json_data['product_type']),
+            position_type=PositionType(json_data['position_type']),
+            symbol=json_data['symbol']
+        ).restore_trigger(json_data)
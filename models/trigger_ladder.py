@@ -0,0 +1,48 @@
+"""
+    The triggers of a stage are the levels
+        cost * (1 + expected return + step * incremental return) - wallet / quantity
+    for step 1, 2, 3, ... and the current trigger is the highest level below the selling price.
+
+    Instead of walking up the levels one at a time, the step is solved for directly and then corrected by comparing the
+    exact levels, for all the stages of the stage table at once.
+"""
+import numpy as np
+
+
+def ladder_levels(steps: np.ndarray, cost: np.ndarray, wallet_share: np.ndarray, expected_return: np.ndarray,
+                  incremental_return: np.ndarray) -> np.ndarray:
+    """
+        level of the given step of every stage
+    """
+    return cost * (1 + expected_return + steps * incremental_return) - wallet_share
+
+
+def highest_steps_below(cost: np.ndarray, wallet_share: np.ndarray, price: np.ndarray, expected_return: np.ndarray,
+                        incremental_return: np.ndarray) -> np.ndarray:
+    """
+        returns the highest step of every stage whose level is below the price, 0 if even the first level is not
+        below it.
+
+        The step is first estimated by solving cost * (1 + E + step * I) - wallet_share = price and then corrected
+        by comparing the exact levels, since the estimate can be off by one due to rounding.
+    """
+    def levels(steps):
+        return ladder_levels(steps, cost, wallet_share, expected_return, incremental_return)
+
+    valid = (cost > 0) & (incremental_return > 0) & (levels(np.ones_like(cost, dtype=np.int64)) < price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        estimate = ((price + wallet_share) / cost - 1 - expected_return) / incremental_return
+    estimate = np.where(valid & np.isfinite(estimate), np.clip(np.ceil(estimate) - 1, 1, 2 ** 31), 1)
+    steps = estimate.astype(np.int64)
+
+    while True:
+        above = valid & (steps > 1) & (levels(steps) >= price)
+        if not above.any():
+            break
+        steps -= above
+    while True:
+        below = valid & (levels(steps + 1) < price)
+        if not below.any():
+            break
+        steps += below
+    return np.where(valid, steps, 0)
@@ -1,6 +1,8 @@
 from datetime import datetime
 from bson import ObjectId
 
+from utils.trading_calendar import trading_calendar
+
 
 class Wallet:
     """
@@ -16,6 +18,8 @@ class Wallet:
 
     """
 
+    __slots__ = ('starting_date', 'starting_price', 'stock_name', 'accumulated_profit', 'wallet_id')
+
     def __init__(
             self,
             starting_date: datetime,
@@ -42,8 +46,10 @@ class Wallet:
         checks whether the accumulated profit has exceeded the overall profit
         :return: a boolean True or False
         """
-        current_date = datetime.now()
-        no_of_days = (current_date - self.starting_date).days
+        # the trading days elapsed since the starting date, i.e., the starting day itself is not counted. It is at
+        # least one, as it is 0 on the starting day or on a weekend or holiday right after it, and -1 if the starting
+        # day is not a trading day
+        no_of_days = max(1, trading_calendar.trading_days(self.starting_date.date(), datetime.now().date()) - 1)
         # since start_price*(1+expected_return)**no_of_days = accumulated_profit, so
         actual_return = ((self.accumulated_profit / self.starting_price)**(1/no_of_days)) - 1
         expected_return = ((1+0.005)**no_of_days) - 1
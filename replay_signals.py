@@ -0,0 +1,71 @@
+"""
+    Replays the recorded prices in the tick journals through StockInfo and checks that every buy decision
+    and indicator price is identical to the one given by the dataframe computation over the whole history.
+
+    usage: python replay_signals.py [SYMBOL ...]
+"""
+import os
+import sys
+import tempfile
+from glob import glob
+
+import pandas as pd
+
+from models.stock_info import StockInfo
+from utils.tick_journal import journal_path, read_ticks
+
+
+def dataframe_decision(stock_df: pd.DataFrame, return_trace):
+    """
+        buy decision and indicator price computed over the whole dataframe the way whether_buy used to do it
+    """
+    actual_price = stock_df.copy()
+    actual_price.loc[:, 'line'] = StockInfo.kaufman_indicator(actual_price['price'])
+    actual_price.loc[:, 'signal'] = actual_price.line.ewm(span=10).mean()
+    actual_price.dropna(inplace=True)
+    actual_price.reset_index(inplace=True)
+    returns = actual_price.pct_change() + 1
+
+    indicator_price = None if actual_price.shape[0] == 0 else actual_price.signal.iloc[actual_price.shape[0] - 1]
+    if actual_price.shape[0] > 1:
+        last_step = actual_price.shape[0] - 1
+        if returns.signal.iloc[last_step - 1] < 1 <= returns.signal.iloc[last_step] and round(
+                actual_price.signal.iloc[last_step - 1], 2) == round(actual_price.signal.min(), 2):
+            return_trace = returns.signal.iloc[last_step]
+        if return_trace:
+            return_trace *= returns.signal.iloc[-1]
+            if return_trace > 1.001:
+                return True, None, indicator_price
+    return False, return_trace, indicator_price
+
+
+def replay(prices: list[float]) -> int:
+    """
+        returns the number of ticks on which the streaming and the dataframe computation differ
+    """
+    stock = StockInfo("REPLAY")
+    return_trace = None
+    mismatches = 0
+    for step, price in enumerate(prices):
+        stock.update_price(price)
+        expected, return_trace, indicator_price = dataframe_decision(
+            pd.DataFrame({"price": prices[:step + 1]}), return_trace)
+        if stock.whether_buy() != expected or stock.latest_indicator_price != indicator_price:
+            mismatches += 1
+    return mismatches
+
+
+if __name__ == "__main__":
+    symbols = sys.argv[1:] or sorted(os.path.basename(file)[:-4] for file in glob(journal_path("*")))
+    series = {symbol: [float(price) for price in read_ticks(symbol)['price']] for symbol in symbols}
+
+    # StockInfo loads the history of a symbol from temp/, hence the replay runs from an empty directory
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        os.mkdir("temp")
+        failed = False
+        for symbol, prices in series.items():
+            mismatches = replay(prices)
+            failed |= mismatches > 0
+            print(f"{symbol}: {len(prices)} ticks, {mismatches} mismatches")
+    sys.exit(1 if failed else 0)
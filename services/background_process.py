@@ -1,114 +1,272 @@
-from asyncio import sleep
+from asyncio import gather
 from datetime import datetime
 from logging import Logger
 
-from constants.enums.position_type import PositionType
-from constants.enums.product_type import ProductType
-from constants.settings import END_TIME, SLEEP_INTERVAL, START_TIME, STOP_BUYING_TIME, end_process
+from constants.settings import END_TIME, SLEEP_INTERVAL, START_TIME, STOP_BUYING_TIME, TICK_SOURCE, end_process
 from models.account import Account
 
 from models.stock_info import StockInfo
 from models.stock_stages.holdings import Holding
 from models.stock_stages.positions import Position
 from routes.stock_input import chosen_stocks
-from services.take_position import long
+from services.checkpoint import checkpoint_queue
+from services.order_pipeline import order_pipeline
+from services.price_feed import fetch_latest_prices, instrument_key
+from services.tick_scheduler import TickScheduler
+from services.tick_stream import TickTransport, create_transport
 from utils.logger import get_logger
+from utils.nr_db import ensure_unique_index
 
 logger: Logger = get_logger(__name__)
 
 
-async def background_task():
+def add_chosen_stocks(stocks_to_track: dict[str, StockInfo], account: Account):
     """
-        all the tasks mentioned here will be running in the background
+        if any new stock is added then it will be added in the stock to track.
+        A stock which is already held keeps the stock of its holding, along with its prices
     """
-    global logger
+    for chosen_stock in chosen_stocks():
+        if chosen_stock not in stocks_to_track:
+            holding = account.holdings.get(chosen_stock)
+            if holding is not None and holding.stock is not None:
+                stocks_to_track[chosen_stock] = holding.stock
+            else:
+                stocks_to_track[chosen_stock] = StockInfo(chosen_stock, 'NSE')
+            checkpoint_queue.mark(stocks_to_track[chosen_stock])
 
-    logger.info("BACKGROUND TASK STARTED")
-    current_time = datetime.now()
 
-    account: Account = Account()
+def tracked_and_held_stocks(stocks_to_track: dict[str, StockInfo], account: Account) -> list[StockInfo]:
+    """
+        returns all the stocks which are being tracked as well as the ones being held.
+
+        A holding whose symbol is not tracked gets a stock of its own, so that it is still priced, evaluated and sold
+    """
+    stocks = list(stocks_to_track.values())
+    for holding in account.holdings.values():
+        if holding.symbol in stocks_to_track:
+            continue
+        if holding.stock is None:
+            logger.warning(f"{holding.symbol} is held but not tracked, it is priced for the holding alone")
+            holding.stock = StockInfo(holding.symbol, 'NSE')
+        stocks.append(holding.stock)
+    return stocks
+
+
+def evaluate_stocks(
+        account: Account,
+        stocks_to_track: dict[str, StockInfo],
+        current_time: datetime,
+        symbols: set[str] | None = None
+):
+    """
+        buys the stocks which meet the buying criteria and sells the positions and holdings whose trigger is breached.
 
-    stocks_to_track: dict[str, StockInfo] = {}
+        If symbols are given then only those symbols are evaluated, which is used when the ticks are streamed
+    """
+    evaluate_buying(account, stocks_to_track, current_time, symbols)
+    evaluate_breaches(account, symbols)
 
-    stock_list = await StockInfo.retrieve_all_services()
-    logger.info(f"{stock_list}")
 
+def evaluate_buying(
+        account: Account,
+        stocks_to_track: dict[str, StockInfo],
+        current_time: datetime,
+        symbols: set[str] | None = None
+):
     """
-        fetch all the stocks already added in stock list
+        if certain criteria is met then buy stocks
+    """
+    if START_TIME < current_time < STOP_BUYING_TIME:
+        account.buy_stocks(
+            stocks_to_track if symbols is None
+            else {symbol: stocks_to_track[symbol] for symbol in symbols if symbol in stocks_to_track}
+        )
+
+
+def evaluate_breaches(account: Account, symbols: set[str] | None = None):
+    """
+        sells the positions and holdings whose trigger is breached
+    """
+    account.sell_breached(symbols)
+
+
+async def ensure_indexes():
     """
-    for stock_obj in stock_list:
-        stocks_to_track[stock_obj.symbol] = stock_obj
+        makes sure that there is a unique index on symbol in each collection
+    """
+    for collection_name in (StockInfo.COLLECTION_NAME, Holding.COLLECTION_NAME, Position.COLLECTION_NAME):
+        try:
+            await ensure_unique_index(collection_name, 'symbol')
+        except:
+            logger.exception(f"could not create the index on symbol in {collection_name}")
+
+
+async def load_session(account: Account) -> dict[str, StockInfo]:
+    """
+        fetches the stocks, the holdings and the positions saved by the checkpoints concurrently,
+        links the holdings and the positions to their stocks and returns the stocks to track
+    """
+    stock_list, holding_list, position_list, _ = await gather(
+        StockInfo.retrieve_all_services(),
+        Holding.retrieve_all_services(),
+        Position.retrieve_all_services(),
+        ensure_indexes()
+    )
+    logger.info(f"{len(stock_list)} stocks, {len(holding_list)} holdings and {len(position_list)} positions loaded")
 
-    holding_list = await Holding.retrieve_all_services()
-    logger.info(f"{[holding.json() for holding in holding_list]}")
+    """
+        fetch all the stocks already added in stock list
+    """
+    stocks_to_track = {stock_obj.symbol: stock_obj for stock_obj in stock_list}
 
     for holding_obj in holding_list:
         account.holdings[holding_obj.symbol] = holding_obj
-        if holding_obj.symbol in list(stocks_to_track.keys()):
-            account.holdings[holding_obj.symbol].stock = stocks_to_track[holding_obj.symbol]
+        holding_obj.stock = stocks_to_track.get(holding_obj.symbol)
 
-    initial_list_of_holdings = account.holdings.keys()
+    """
+        the positions saved by the checkpoints are restored if the process is restarted during the session
+    """
+    for position_obj in position_list:
+        account.positions[position_obj.symbol] = position_obj
+        position_obj.stock = stocks_to_track.get(position_obj.symbol)
 
-    while current_time < END_TIME:
-        await sleep(SLEEP_INTERVAL)
-        current_time = datetime.now()
+    return stocks_to_track
 
-        try:
 
-            """
-                if any new stock is added then it will be added in the stock to track
-            """
-            for chosen_stock in chosen_stocks():
-                if chosen_stock not in list(stocks_to_track.keys()):
-                    stocks_to_track[chosen_stock] = StockInfo(chosen_stock, 'NSE')
+async def consume_ticks(transport: TickTransport, stocks_to_track: dict[str, StockInfo], account: Account):
+    """
+        subscribes to all the tracked and held stocks and evaluates each stock as soon as its tick arrives.
 
-            """
-                update price for all the stocks which are being tracked
-            """
-            for stock in stocks_to_track.keys():
-                stocks_to_track[stock].update_price()
+        Newly chosen stocks are subscribed as they are added and the prices are saved every SLEEP_INTERVAL.
+    """
+    subscribed: dict[str, StockInfo] = {}
+    last_saved = datetime.now()
+    try:
+        while datetime.now() < END_TIME and not end_process():
+            add_chosen_stocks(stocks_to_track, account)
+            new_stocks = {
+                instrument_key(stock): stock
+                for stock in tracked_and_held_stocks(stocks_to_track, account)
+                if instrument_key(stock) not in subscribed
+            }
+            if new_stocks:
+                await transport.subscribe(list(new_stocks.keys()))
+                subscribed.update(new_stocks)
+
+            await checkpoint_queue.wait_for_room()
+            tick = await transport.next_tick(timeout=1)
+            current_time = datetime.now()
+            if tick is not None and tick[0] in subscribed:
+                instrument, price = tick
+                stock = subscribed[instrument]
+                stock.update_price(price)
+                try:
+                    evaluate_stocks(account, stocks_to_track, current_time, symbols={stock.stock_name})
+                except:
+                    logger.exception(f"error while evaluating {stock.stock_name}")
+
+            if (current_time - last_saved).total_seconds() >= SLEEP_INTERVAL:
+                for stock in subscribed.values():
+                    stock.save_prices()
+                last_saved = current_time
+    finally:
+        for stock in subscribed.values():
+            stock.save_prices()
+        await transport.close()
 
-            if end_process():
-                break
 
-            """
-                if certain criteria is met then buy stocks
-            """
-            if START_TIME < current_time < STOP_BUYING_TIME:
-                account.buy_stocks(stocks_to_track)
+async def background_task():
+    """
+        all the tasks mentioned here will be running in the background
+    """
+    global logger
 
-            """
-                if the trigger for selling is breached in position then sell
-            """
+    logger.info("BACKGROUND TASK STARTED")
+    current_time = datetime.now()
 
-            positions_to_delete = []  # this is needed or else it will alter the length during loop
+    account: Account = Account()
 
-            for position_name in account.positions.keys():
-                position: Position = account.positions[position_name]
-                if position.breached():
-                    logger.info(f" line 89 -->sell {position.stock.stock_name} at {position.stock.latest_price}")
-                    positions_to_delete.append(position_name)
+    stocks_to_track: dict[str, StockInfo] = await load_session(account)
 
-            for position_name in positions_to_delete:
-                del account.positions[position_name]
+    initial_list_of_holdings = set(account.holdings.keys())
 
-            """
-                if the trigger for selling is breached in holding then sell
-            """
+    checkpoint_queue.start()
 
-            holdings_to_delete = []  # this is needed or else it will alter the length during loop
+    if TICK_SOURCE != "POLLING":
+        """
+            ticks are pushed by the transport and evaluated as they arrive, polling is used only if the stream fails
+        """
+        try:
+            await consume_ticks(create_transport(TICK_SOURCE), stocks_to_track, account)
+        except Exception:
+            logger.exception("Tick stream stopped, falling back to polling")
+        current_time = datetime.now()
 
-            for holding_name in account.holdings.keys():
-                holding: Holding = account.holdings[holding_name]
+    scheduler = TickScheduler(SLEEP_INTERVAL)
+    # the watched stocks are taken round robin, a tick starts from the first one deferred by the earlier tick
+    watch_offset = 0
 
-                if holding.breached():
-                    logger.info(f" line 89 -->sell {holding.stock.stock_name} at {holding.stock.latest_price}")
-                    holdings_to_delete.append(holding_name)
+    while current_time < END_TIME and not end_process():
+        await scheduler.wait_for_tick()
+        await checkpoint_queue.wait_for_room()
+        current_time = datetime.now()
 
-            for holding_name in holdings_to_delete:
-                del account.holdings[holding_name]
+        try:
+            add_chosen_stocks(stocks_to_track, account)
 
-        except:
+            """
+                update price for all the stocks which are being tracked as well as the ones being held.
+                If the tick is expected to miss its deadline, the stocks with an open position or holding
+                are processed first and only as many of the ones which are only being watched as time permits,
+                the others are processed first by the next tick
+            """
+            stocks_to_update = tracked_and_held_stocks(stocks_to_track, account)
+            exposed_symbols = set(account.positions.keys()) | set(account.holdings.keys())
+            exposed_stocks = [stock for stock in stocks_to_update if stock.stock_name in exposed_symbols]
+            watched_stocks = [stock for stock in stocks_to_update if stock.stock_name not in exposed_symbols]
+            if watched_stocks:
+                watch_offset %= len(watched_stocks)
+                watched_stocks = watched_stocks[watch_offset:] + watched_stocks[:watch_offset]
+
+            if scheduler.would_overrun(len(stocks_to_update)):
+                stock_groups = [exposed_stocks, watched_stocks]
+            else:
+                stock_groups = [exposed_stocks + watched_stocks]
+
+            processed_stocks = []
+            for stocks in stock_groups:
+                if stocks is watched_stocks:
+                    affordable = scheduler.affordable_stocks(len(stocks))
+                    if affordable < len(stocks):
+                        logger.warning(f"{len(stocks) - affordable} watched stocks are deferred to the next tick")
+                        stocks = stocks[:affordable]
+                        watch_offset += affordable
+                if not stocks:
+                    continue
+
+                with scheduler.stage("fetch"):
+                    prices = await fetch_latest_prices(stocks)
+                with scheduler.stage("indicators"):
+                    StockInfo.update_prices(stocks, [prices.get(instrument_key(stock)) for stock in stocks])
+
+                if end_process():
+                    break
+
+                symbols = {stock.stock_name for stock in stocks}
+                with scheduler.stage("buy"):
+                    evaluate_buying(account, stocks_to_track, current_time, symbols)
+                with scheduler.stage("breach"):
+                    evaluate_breaches(account, symbols)
+                processed_stocks += stocks
+
+            """
+                the prices received in this tick are saved once all the decisions have been taken
+            """
+            for stock in processed_stocks:
+                stock.save_prices()
+            scheduler.finish_tick(len(processed_stocks))
+
+        except Exception:
             logger.exception("Kite error may have happened")
 
     """
@@ -120,37 +278,28 @@ async def background_task():
         """
             At the end of the day decide whether to buy a stock if it is falling
         """
-        if stock_key not in account.positions.keys():
+        if stock_key not in account.positions.keys() and stock_key not in account.pending_buys:
             stock = stocks_to_track[stock_key]
             close, high, low = stock.latest_price, stock.high, stock.low
             if close < high*(1-0.01) and close < low*(1+0.005):
-                if long(
-                    symbol=stocks_to_track[stock_key].symbol,
-                    quantity=int(5000 / stocks_to_track[stock_key].latest_indicator_price),
-                    product_type=ProductType.DELIVERY,
-                    exchange=stocks_to_track[stock_key].exchange
-                ):
-                    account.positions[stock_key] = Position(
-                        buy_price=stocks_to_track[stock_key].latest_price,
-                        stock=stocks_to_track[stock_key],
-                        position_type=PositionType.LONG,
-                        position_price=stocks_to_track[stock_key].latest_indicator_price,
-                        quantity=int(5000 / stocks_to_track[stock_key].latest_indicator_price),
-                        product_type=ProductType.DELIVERY,
-                        symbol=stock_key
-                    )
+                account.buy(stock_key, stock)
 
-        """
-            if the remaining stock to track is already available update it or else add a new record in db
-        """
-        stock_model = await stocks_to_track[stock_key].find_by_name({'symbol': stock_key})
-        if stock_model is None:
-            await stocks_to_track[stock_key].save_to_db()
-        else:
-            await stocks_to_track[stock_key].update_in_db(
-                search_dict={'symbol': stock_key},
-                data={'wallet': stocks_to_track[stock_key].wallet}
-            )
+    """
+        the remaining stocks to track are saved, the ones already in the db only if their wallet has changed
+    """
+    await StockInfo.bulk_save(list(stocks_to_track.values()))
+
+    """
+        the positions are converted to holdings once all the orders have been placed
+    """
+    await order_pipeline.join()
+
+    """
+        the changes which have not been checkpointed yet are saved before the end of day persistence,
+        after which the positions saved by the checkpoints are deleted as they become holdings
+    """
+    await checkpoint_queue.close()
+    await Position.bulk_save([], list(account.positions.keys()))
 
     for position_key in account.positions:
         position = account.positions[position_key]
@@ -164,18 +313,12 @@ async def background_task():
             stock=position.stock
         )
 
-    for holding_key in account.holdings.keys():
-        holding_model = await account.holdings[holding_key].find_by_name({'symbol': holding_key})
-        if holding_model is None:
-            await account.holdings[holding_key].save_to_db()
-        else:
-            await account.holdings[holding_key].update_in_db(
-                search_dict={'symbol': holding_key},
-                data=account.holdings[holding_key].json()
-            )
-
-    for holding_key in initial_list_of_holdings:
-        if holding_key not in list(account.holdings.keys()):
-            await account.holdings[holding_key].delete_from_db(search_dict={'symbol': holding_key})
+    """
+        the holdings are saved and the ones which have been sold during the day are deleted
+    """
+    await Holding.bulk_save(
+        list(account.holdings.values()),
+        [holding_key for holding_key in initial_list_of_holdings if holding_key not in account.holdings]
+    )
 
     logger.info("TASK ENDED")
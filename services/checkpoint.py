@@ -0,0 +1,116 @@
+from asyncio import Event, Task, TimeoutError, create_task, wait_for
+from logging import Logger
+
+from constants.settings import CHECKPOINT_BATCH_SIZE, CHECKPOINT_INTERVAL, CHECKPOINT_MAX_PENDING
+from utils.logger import get_logger
+from utils.repository import repositories
+
+logger: Logger = get_logger(__name__)
+
+
+class CheckpointQueue:
+    """
+        Write behind persistence of the in memory state, so that a crash during the session does not lose it and
+        the ticks do not wait for the database.
+
+        The stocks, positions and holdings which change are marked dirty. Marking an object again before it is
+        written only keeps the latest mark, and the document is built when it is written, so it always holds the
+        latest state. Every CHECKPOINT_INTERVAL seconds the dirty objects are written by a background task with one
+        bulk write per collection (in batches of CHECKPOINT_BATCH_SIZE) through the repository of the collection, which
+        only sends the fields that have changed.
+
+        If more than CHECKPOINT_MAX_PENDING objects are waiting, wait_for_room makes the caller wait till they are
+        written. close stops the background task once it has finished writing and writes whatever is left.
+    """
+
+    def __init__(
+            self,
+            interval: float = CHECKPOINT_INTERVAL,
+            max_pending: int = CHECKPOINT_MAX_PENDING,
+            batch_size: int = CHECKPOINT_BATCH_SIZE
+    ) -> None:
+        self.interval = interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        # (collection, symbol) -> object to be saved, or None if the document has to be deleted
+        self.dirty: dict[tuple[str, str], object | None] = {}
+        self.task: Task | None = None
+        self.closing = False
+        self.__wake_up = Event()
+        self.__flushed = Event()
+
+    def mark(self, model) -> None:
+        """
+            the model (StockInfo, Position or Holding) has changed and has to be saved
+        """
+        # makes sure the repository of the collection, which flush writes through, exists
+        model.repository()
+        self.dirty[(model.COLLECTION_NAME, model.symbol)] = model
+
+    def mark_deleted(self, model) -> None:
+        """
+            the model is no longer held and its document has to be deleted
+        """
+        model.repository()
+        self.dirty[(model.COLLECTION_NAME, model.symbol)] = None
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = create_task(self.__run())
+
+    async def wait_for_room(self) -> None:
+        """
+            back pressure, waits till the pending objects have been written if there are too many of them
+        """
+        if len(self.dirty) > self.max_pending and self.task is not None:
+            logger.warning(f"{len(self.dirty)} objects are waiting to be saved")
+            self.__flushed.clear()
+            self.__wake_up.set()
+            await self.__flushed.wait()
+
+    async def __run(self) -> None:
+        while not self.closing:
+            try:
+                await wait_for(self.__wake_up.wait(), timeout=self.interval)
+            except TimeoutError:
+                pass
+            self.__wake_up.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+            writes all the dirty objects, the ones which could not be written are marked dirty again
+        """
+        batch, self.dirty = self.dirty, {}
+        collections: dict[str, list[tuple[tuple[str, str], object | None]]] = {}
+        for key, model in batch.items():
+            collections.setdefault(key[0], []).append((key, model))
+
+        for collection_name, entries in collections.items():
+            for start in range(0, len(entries), self.batch_size):
+                chunk = entries[start:start + self.batch_size]
+                try:
+                    await repositories[collection_name].bulk_save(
+                        [model for _, model in chunk if model is not None],
+                        [key[1] for key, model in chunk if model is None]
+                    )
+                except Exception:
+                    logger.exception(f"checkpoint of {len(chunk)} documents in {collection_name} failed")
+                    for key, model in chunk:
+                        self.dirty.setdefault(key, model)
+        self.__flushed.set()
+
+    async def close(self) -> None:
+        """
+            stops the background task and writes whatever is left
+        """
+        if self.task is not None:
+            self.closing = True
+            self.__wake_up.set()
+            await self.task
+            self.task = None
+            self.closing = False
+        await self.flush()
+
+
+checkpoint_queue = CheckpointQueue()
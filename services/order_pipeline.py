@@ -0,0 +1,132 @@
+from asyncio import Lock, Queue, Task, create_task, get_running_loop, sleep
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from logging import Logger
+from time import monotonic
+from typing import Callable
+
+from constants.enums.position_type import PositionType
+from constants.enums.product_type import ProductType
+from constants.global_contexts import kite_context
+from constants.settings import ORDER_CONCURRENCY, ORDER_RATE_LIMIT
+from services.take_position import long, short
+from utils.logger import get_logger
+
+logger: Logger = get_logger(__name__)
+
+
+class Order:
+    """
+        An order to be placed by the order pipeline. Once it has been sent, placed tells whether the broker accepted it
+        and the callback (if any) is called with the order.
+    """
+
+    def __init__(
+            self,
+            symbol: str,
+            quantity: int,
+            product_type: ProductType,
+            exchange: str,
+            position_type: PositionType,
+            callback: Callable[['Order'], None] | None = None
+    ) -> None:
+        self.symbol = symbol
+        self.quantity = quantity
+        self.product_type = product_type
+        self.exchange = exchange
+        self.position_type = position_type
+        self.callback = callback
+
+        self.submitted_at = monotonic()
+        self.sent_at: float | None = None
+        self.placed: bool | None = None
+
+
+class RateLimiter:
+    """
+        Allows at most limit acquisitions within any window of period seconds.
+
+        The times of the last limit acquisitions are kept, and an acquisition waits till the oldest of them is at least
+        period seconds old. Unlike a token bucket, which can hand out a full bucket and its refill within the same
+        second, the limit holds for every window and not only on average.
+    """
+
+    def __init__(self, limit: int, period: float = 1.) -> None:
+        self.limit = limit
+        self.period = period
+        self.acquired: deque[float] = deque(maxlen=limit)
+        self.lock = Lock()
+
+    async def acquire(self) -> float:
+        """
+            waits till the limit allows one more acquisition and returns the time of the acquisition
+        """
+        async with self.lock:
+            while len(self.acquired) == self.limit and monotonic() < self.acquired[0] + self.period:
+                await sleep(self.acquired[0] + self.period - monotonic())
+            self.acquired.append(monotonic())
+            return self.acquired[-1]
+
+
+class OrderPipeline:
+    """
+        Queues the orders and sends them concurrently, without exceeding the number of orders per second the broker
+        accepts, so that a burst of orders neither goes out one after another nor blocks the event loop.
+
+        The blocking kite client runs in a thread pool. The result of each order is reported back through the
+        callback of the order, on the event loop.
+    """
+
+    def __init__(self, broker=kite_context, rate: float = ORDER_RATE_LIMIT, concurrency: int = ORDER_CONCURRENCY) -> None:
+        self.broker = broker
+        self.limiter = RateLimiter(max(1, int(rate)))
+        self.concurrency = concurrency
+        self.queue: Queue[Order] = Queue()
+        self.workers: list[Task] = []
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="order")
+
+    def submit(self, order: Order) -> None:
+        """
+            queues the order, it must be called from the event loop
+        """
+        if not self.workers:
+            self.workers = [create_task(self.__work()) for _ in range(self.concurrency)]
+        self.queue.put_nowait(order)
+
+    async def __work(self) -> None:
+        loop = get_running_loop()
+        while True:
+            order = await self.queue.get()
+            try:
+                order.sent_at = await self.limiter.acquire()
+                place = long if order.position_type == PositionType.LONG else short
+                order.placed = await loop.run_in_executor(self.executor, partial(
+                    place,
+                    symbol=order.symbol,
+                    quantity=order.quantity,
+                    product_type=order.product_type,
+                    exchange=order.exchange,
+                    broker=self.broker
+                ))
+                if order.callback is not None:
+                    order.callback(order)
+            except Exception:
+                logger.exception(f"error while placing the order of {order.symbol}")
+            finally:
+                self.queue.task_done()
+
+    async def join(self) -> None:
+        """
+            waits till all the orders submitted till now have been placed
+        """
+        await self.queue.join()
+
+    async def close(self) -> None:
+        await self.join()
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
+
+
+order_pipeline = OrderPipeline()
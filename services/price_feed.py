@@ -0,0 +1,83 @@
+from asyncio import Semaphore, gather, get_running_loop, sleep, wait_for
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+
+from constants.global_contexts import kite_context
+from constants.settings import (
+    LTP_BATCH_SIZE,
+    PRICE_FETCH_BACKOFF,
+    PRICE_FETCH_CONCURRENCY,
+    PRICE_FETCH_RETRIES,
+    PRICE_FETCH_TIMEOUT
+)
+from models.stock_info import StockInfo
+from utils.logger import get_logger
+
+logger: Logger = get_logger(__name__)
+
+# the kite client is blocking, hence it is called from these threads instead of the event loop
+price_fetch_executor = ThreadPoolExecutor(max_workers=PRICE_FETCH_CONCURRENCY, thread_name_prefix="price-fetch")
+
+
+def instrument_key(stock: StockInfo) -> str:
+    """
+        returns the key used by kite to identify the instrument, e.g. NSE:INFY
+    """
+    return f"{stock.exchange}:{stock.stock_name}"
+
+
+async def fetch_batch(batch: list[str], semaphore: Semaphore) -> dict[str, dict]:
+    """
+        returns the ltp response of kite for the instruments in the batch with a single ltp request.
+
+        The blocking kite client runs in a dedicated thread pool so that the event loop (and hence every route)
+        stays responsive. Each attempt is limited to PRICE_FETCH_TIMEOUT seconds and it is retried
+        PRICE_FETCH_RETRIES times, waiting longer after each failure.
+    """
+    loop = get_running_loop()
+    async with semaphore:
+        for attempt in range(PRICE_FETCH_RETRIES):
+            try:
+                return await wait_for(
+                    loop.run_in_executor(price_fetch_executor, kite_context.ltp, batch),
+                    timeout=PRICE_FETCH_TIMEOUT
+                )
+            except Exception:
+                if attempt < PRICE_FETCH_RETRIES - 1:
+                    await sleep(PRICE_FETCH_BACKOFF * 2 ** attempt)
+    logger.error(f"could not fetch the price of {len(batch)} instruments")
+    return {}
+
+
+async def fetch_ltp(instruments: list[str]) -> dict[str, dict]:
+    """
+        returns the ltp response of kite for all the instruments keyed by the instrument key.
+
+        Instead of one ltp request per instrument, the instruments are split in chunks of LTP_BATCH_SIZE
+        (the maximum number of instruments kite accepts in one ltp call) so that a full tick costs
+        only a few round trips. At most PRICE_FETCH_CONCURRENCY chunks are requested at the same time.
+        If a chunk still fails after all the retries the instruments in it are left out.
+    """
+    instruments = list(dict.fromkeys(instruments))
+    semaphore = Semaphore(PRICE_FETCH_CONCURRENCY)
+    batches = [instruments[start:start + LTP_BATCH_SIZE] for start in range(0, len(instruments), LTP_BATCH_SIZE)]
+
+    response: dict[str, dict] = {}
+    for batch_response in await gather(*(fetch_batch(batch, semaphore) for batch in batches)):
+        response.update(batch_response)
+    return response
+
+
+async def fetch_latest_prices(stocks: list[StockInfo]) -> dict[str, float]:
+    """
+        returns the last traded price of every stock keyed by its instrument key.
+
+        The stocks whose price could not be fetched are left out, in which case they keep their older latest price.
+    """
+    response = await fetch_ltp([instrument_key(stock) for stock in stocks])
+    return {
+        instrument: float(quote["last_price"])
+        for instrument, quote in response.items()
+        if quote.get("last_price") is not None
+    }
+
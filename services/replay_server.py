@@ -0,0 +1,62 @@
+import json
+from asyncio import StreamReader, StreamWriter, Task, create_task, run, sleep, start_server
+
+import numpy as np
+
+from constants.settings import RECORDED_TICK_DIRECTORY, REPLAY_SERVER_HOST, REPLAY_SERVER_PORT
+from utils.tick_journal import read_ticks
+
+
+class ReplayServer:
+    """
+        Local stand-in for the tick websocket, used for testing the streaming mode without a market session.
+
+        A client subscribes by sending {"subscribe": ["NSE:INFY", ...]} as a line of json. The ticks recorded in the
+        tick journal of each subscribed symbol in RECORDED_TICK_DIRECTORY are then sent back as lines of json (the
+        client journals what it receives in a separate directory). The gap between two ticks is the recorded gap
+        divided by speed, or interval if the timestamps are not available.
+    """
+
+    def __init__(
+            self,
+            host: str = REPLAY_SERVER_HOST,
+            port: int = REPLAY_SERVER_PORT,
+            speed: float = 1.0,
+            interval: float = 0.01
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.interval = interval
+
+    async def serve_forever(self) -> None:
+        server = await start_server(self.handle, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader: StreamReader, writer: StreamWriter) -> None:
+        replays: list[Task] = []
+        try:
+            async for line in reader:
+                for instrument in json.loads(line).get("subscribe", []):
+                    replays.append(create_task(self.replay(instrument, writer)))
+        finally:
+            for replay in replays:
+                replay.cancel()
+            writer.close()
+
+    async def replay(self, instrument: str, writer: StreamWriter) -> None:
+        ticks = read_ticks(instrument.split(":")[-1], RECORDED_TICK_DIRECTORY)
+        for index in range(ticks.shape[0]):
+            if index > 0:
+                gap = ticks['timestamp'][index] - ticks['timestamp'][index - 1]
+                await sleep(gap / self.speed if np.isfinite(gap) and gap >= 0 else self.interval)
+            writer.write((json.dumps({
+                "instrument": instrument,
+                "last_price": float(ticks['price'][index])
+            }) + "\n").encode())
+            await writer.drain()
+
+
+if __name__ == "__main__":
+    run(ReplayServer().serve_forever())
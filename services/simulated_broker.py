@@ -0,0 +1,148 @@
+import random
+from itertools import count
+from threading import Lock
+from time import sleep
+from zlib import crc32
+
+from constants.settings import RECORDED_TICK_DIRECTORY
+from utils.tick_journal import read_ticks
+
+
+class SimulatedBroker:
+    """
+        Local stand-in for the part of KiteConnect used by the application (ltp, place_order, holdings and orders),
+        so that the loop can be load tested and profiled without a market session. It is selected by setting
+        BROKER to "SIMULATED" in the settings.
+
+        Every instrument follows a price path. If the symbol has a journal in RECORDED_TICK_DIRECTORY the recorded
+        prices are followed, otherwise a random walk seeded by the symbol is generated. Each ltp request moves the
+        requested instruments one step along their path, and the last recorded price is kept once the path is over.
+        The session itself journals its ticks in a separate directory, so the recorded journals are left untouched.
+
+        Every request takes latency seconds, like a round trip to the broker, and fails with a ConnectionError with
+        the probability error_rate. Orders are filled immediately at the current price of the instrument.
+    """
+
+    VARIETY_REGULAR = "regular"
+    ORDER_TYPE_MARKET = "MARKET"
+    EXCHANGE_NSE = "NSE"
+    EXCHANGE_BSE = "BSE"
+    TRANSACTION_TYPE_BUY = "BUY"
+    TRANSACTION_TYPE_SELL = "SELL"
+    PRODUCT_MIS = "MIS"
+    PRODUCT_CNC = "CNC"
+    VALIDITY_DAY = "DAY"
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0., volatility: float = 0.002, seed: int = 0) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.volatility = volatility
+        self.seed = seed
+        self.api_key = "simulated"
+        self.access_token: str | None = None
+
+        self.placed_orders: list[dict] = []
+        self.__order_ids = count(1)
+        # recorded path (None if synthetic), position on the path and current price of every instrument
+        self.__paths: dict[str, list[float] | None] = {}
+        self.__steps: dict[str, int] = {}
+        self.__prices: dict[str, float] = {}
+        self.__random = random.Random(seed)
+        self.__lock = Lock()
+
+    def set_access_token(self, access_token: str) -> None:
+        self.access_token = access_token
+
+    def __request(self) -> None:
+        sleep(self.latency)
+        with self.__lock:
+            failed = self.__random.random() < self.error_rate
+        if failed:
+            raise ConnectionError("simulated broker error")
+
+    def __price(self, instrument: str) -> float:
+        """
+            current price of the instrument, the path is loaded on the first request
+        """
+        if instrument not in self.__paths:
+            recorded = [float(price) for price in read_ticks(instrument.split(":")[-1], RECORDED_TICK_DIRECTORY)['price']]
+            self.__paths[instrument] = recorded or None
+            self.__steps[instrument] = 0
+            if recorded:
+                self.__prices[instrument] = recorded[0]
+            else:
+                self.__prices[instrument] = random.Random(self.seed + crc32(instrument.encode())).uniform(100, 2000)
+        return self.__prices[instrument]
+
+    def __advance(self, instrument: str) -> None:
+        path = self.__paths[instrument]
+        self.__steps[instrument] += 1
+        if path is None:
+            self.__prices[instrument] *= 1 + self.__random.gauss(0, self.volatility)
+        elif self.__steps[instrument] < len(path):
+            self.__prices[instrument] = path[self.__steps[instrument]]
+
+    def ltp(self, instruments: list[str] | str) -> dict[str, dict]:
+        self.__request()
+        instruments = [instruments] if isinstance(instruments, str) else instruments
+        response = {}
+        with self.__lock:
+            for instrument in instruments:
+                self.__price(instrument)
+                self.__advance(instrument)
+                response[instrument] = {
+                    "instrument_token": crc32(instrument.encode()),
+                    "last_price": round(self.__prices[instrument], 2)
+                }
+        return response
+
+    def place_order(self, variety: str, exchange: str, tradingsymbol: str, transaction_type: str, quantity: int,
+                    product: str, order_type: str, validity: str | None = None, **kwargs) -> str:
+        self.__request()
+        with self.__lock:
+            order_id = str(next(self.__order_ids))
+            self.placed_orders.append({
+                "order_id": order_id,
+                "variety": variety,
+                "exchange": exchange,
+                "tradingsymbol": tradingsymbol,
+                "transaction_type": transaction_type,
+                "quantity": quantity,
+                "product": product,
+                "order_type": order_type,
+                "validity": validity,
+                "average_price": round(self.__price(f"{exchange}:{tradingsymbol}"), 2),
+                "status": "COMPLETE"
+            })
+        return order_id
+
+    def orders(self) -> list[dict]:
+        self.__request()
+        with self.__lock:
+            return list(self.placed_orders)
+
+    def holdings(self) -> list[dict]:
+        """
+            the delivery orders netted per symbol
+        """
+        self.__request()
+        holdings: dict[tuple[str, str], dict] = {}
+        with self.__lock:
+            for order in self.placed_orders:
+                if order["product"] != self.PRODUCT_CNC:
+                    continue
+                holding = holdings.setdefault((order["exchange"], order["tradingsymbol"]), {
+                    "tradingsymbol": order["tradingsymbol"],
+                    "exchange": order["exchange"],
+                    "quantity": 0,
+                    "average_price": 0.
+                })
+                if order["transaction_type"] == self.TRANSACTION_TYPE_BUY:
+                    cost = holding["average_price"] * holding["quantity"] + order["average_price"] * order["quantity"]
+                    holding["quantity"] += order["quantity"]
+                    holding["average_price"] = cost / holding["quantity"]
+                else:
+                    holding["quantity"] -= order["quantity"]
+            for (exchange, symbol), holding in holdings.items():
+                holding["last_price"] = round(self.__price(f"{exchange}:{symbol}"), 2)
+        return [holding for holding in holdings.values() if holding["quantity"] != 0]
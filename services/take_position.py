@@ -8,22 +8,24 @@ from utils.logger import get_logger
 logger: Logger = get_logger(__name__)
 
 
-def short(symbol: str, quantity: int, product_type: ProductType, exchange: str):
+def short(symbol: str, quantity: int, product_type: ProductType, exchange: str, broker=kite_context):
     """
         takes a short position which means it will
         1. sell the position which has already been bought, or
         2. sell a negative quantity of stocks
+
+        the order is placed with the given broker, which is the kite context unless a simulated broker is used
     """
     try:
-        kite_context.place_order(
-            variety=kite_context.VARIETY_REGULAR,
-            order_type=kite_context.ORDER_TYPE_MARKET,
-            exchange=kite_context.EXCHANGE_NSE if exchange == 'NSE' else kite_context.EXCHANGE_BSE,
+        broker.place_order(
+            variety=broker.VARIETY_REGULAR,
+            order_type=broker.ORDER_TYPE_MARKET,
+            exchange=broker.EXCHANGE_NSE if exchange == 'NSE' else broker.EXCHANGE_BSE,
             tradingsymbol=symbol,
-            transaction_type=kite_context.TRANSACTION_TYPE_SELL,
+            transaction_type=broker.TRANSACTION_TYPE_SELL,
             quantity=quantity,
-            product=kite_context.PRODUCT_MIS if product_type == ProductType.INTRADAY else kite_context.PRODUCT_CNC,
-            validity=kite_context.VALIDITY_DAY
+            product=broker.PRODUCT_MIS if product_type == ProductType.INTRADAY else broker.PRODUCT_CNC,
+            validity=broker.VALIDITY_DAY
         )
         return True
     except:
@@ -31,23 +33,25 @@ def short(symbol: str, quantity: int, product_type: ProductType, exchange: str):
         return False
 
 
-def long(symbol: str, quantity: int, product_type: ProductType, exchange: str):
+def long(symbol: str, quantity: int, product_type: ProductType, exchange: str, broker=kite_context):
     """
         takes a long position which means it will
         1. buy the position which has already been short, or
         2. buy a positive quantity of stocks
+
+        the order is placed with the given broker, which is the kite context unless a simulated broker is used
     """
 
     try:
-        kite_context.place_order(
-            variety=kite_context.VARIETY_REGULAR,
-            order_type=kite_context.ORDER_TYPE_MARKET,
-            exchange=kite_context.EXCHANGE_NSE if exchange == 'NSE' else kite_context.EXCHANGE_BSE,
+        broker.place_order(
+            variety=broker.VARIETY_REGULAR,
+            order_type=broker.ORDER_TYPE_MARKET,
+            exchange=broker.EXCHANGE_NSE if exchange == 'NSE' else broker.EXCHANGE_BSE,
             tradingsymbol=symbol,
-            transaction_type=kite_context.TRANSACTION_TYPE_BUY,
+            transaction_type=broker.TRANSACTION_TYPE_BUY,
             quantity=quantity,
-            product=kite_context.PRODUCT_MIS if product_type == ProductType.INTRADAY else kite_context.PRODUCT_CNC,
-            validity=kite_context.VALIDITY_DAY
+            product=broker.PRODUCT_MIS if product_type == ProductType.INTRADAY else broker.PRODUCT_CNC,
+            validity=broker.VALIDITY_DAY
         )
         return True
     except:
@@ -0,0 +1,102 @@
+from contextlib import contextmanager
+from asyncio import sleep
+from logging import Logger
+from time import monotonic
+
+from utils.logger import get_logger
+
+logger: Logger = get_logger(__name__)
+
+
+class TickScheduler:
+    """
+        Fires the ticks on a fixed cadence, i.e., the n-th tick is due n * interval seconds after the start,
+        irrespective of how long the processing of the earlier ticks took. Hence, the period does not drift.
+
+        The time spent in each stage of a tick (fetch, indicators, buy, breach) is measured. If a tick overruns its
+        deadline it is logged and the ticks which were missed are skipped. The measurements are used to predict
+        whether the next tick would miss its deadline, in which case the caller gives priority to the stocks
+        having an open position or holding.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.__start = monotonic()
+        self.__tick_number = 0
+        self.deadline = self.__start + interval
+
+        self.stage_durations: dict[str, float] = {}
+        self.last_tick_duration = 0.
+        self.last_tick_stocks = 0
+        self.__tick_start = self.__start
+
+    async def wait_for_tick(self) -> None:
+        """
+            sleeps till the next tick is due
+        """
+        self.__tick_number += 1
+        due = self.__start + self.__tick_number * self.interval
+        now = monotonic()
+        if now < due:
+            await sleep(due - now)
+        else:
+            missed = int((now - due) // self.interval)
+            if missed:
+                logger.warning(f"{missed} ticks were missed")
+                self.__tick_number += missed
+        self.__tick_start = monotonic()
+        self.deadline = self.__start + (self.__tick_number + 1) * self.interval
+        self.stage_durations = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+            measures the time taken by the stage, a stage can run several times in one tick
+        """
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.stage_durations[name] = self.stage_durations.get(name, 0.) + monotonic() - start
+
+    def remaining(self) -> float:
+        """
+            seconds left before the next tick is due
+        """
+        return self.deadline - monotonic()
+
+    def expected_duration(self, number_of_stocks: int) -> float:
+        """
+            time it is expected to take to process the given number of stocks, based on the last tick
+        """
+        if self.last_tick_stocks == 0:
+            return 0.
+        return self.last_tick_duration * number_of_stocks / self.last_tick_stocks
+
+    def would_overrun(self, number_of_stocks: int) -> bool:
+        return self.expected_duration(number_of_stocks) > self.remaining()
+
+    def affordable_stocks(self, number_of_stocks: int) -> int:
+        """
+            how many of the given number of stocks are expected to be processed before the deadline, based on the
+            last tick
+        """
+        duration_per_stock = self.expected_duration(1)
+        if duration_per_stock * number_of_stocks <= self.remaining() or duration_per_stock == 0:
+            return number_of_stocks
+        return max(0, int(self.remaining() / duration_per_stock))
+
+    def finish_tick(self, number_of_stocks: int) -> None:
+        """
+            records the time taken by the tick and logs it along with the time taken by each stage
+        """
+        duration = monotonic() - self.__tick_start
+        # a tick which processed no stock does not tell the cost of a stock, the earlier estimate is kept
+        if number_of_stocks:
+            self.last_tick_duration = duration
+            self.last_tick_stocks = number_of_stocks
+        stages = ", ".join(f"{name}: {duration:.3f}s" for name, duration in self.stage_durations.items())
+        if self.remaining() < 0:
+            logger.warning(f"tick overran its deadline by {-self.remaining():.3f}s ({stages})")
+        else:
+            logger.info(f"tick took {duration:.3f}s for {number_of_stocks} stocks ({stages})")
@@ -0,0 +1,178 @@
+import json
+from abc import ABC, abstractmethod
+from asyncio import Queue, StreamReader, StreamWriter, Task, TimeoutError, create_task, get_running_loop, \
+    open_connection, wait_for
+from logging import Logger
+
+from kiteconnect import KiteTicker
+
+from constants.global_contexts import kite_context
+from constants.settings import (
+    KITE_TICKER_MAX_CONNECTIONS,
+    KITE_TICKER_MAX_INSTRUMENTS,
+    REPLAY_SERVER_HOST,
+    REPLAY_SERVER_PORT
+)
+from services.price_feed import fetch_ltp
+from utils.logger import get_logger
+
+logger: Logger = get_logger(__name__)
+
+
+class TickTransport(ABC):
+    """
+        A transport pushes the ticks of the subscribed instruments (e.g. NSE:INFY) as they arrive.
+
+        The ticks are put in a queue as (instrument, last price). None is put in the queue when the transport
+        is disconnected, after which next_tick raises a ConnectionError so that the caller can fall back to polling.
+    """
+
+    def __init__(self) -> None:
+        self.queue: Queue[tuple[str, float] | None] = Queue()
+
+    @abstractmethod
+    async def subscribe(self, instruments: list[str]) -> None:
+        """
+            starts pushing the ticks of the instruments, along with the ones subscribed earlier
+        """
+
+    async def close(self) -> None:
+        pass
+
+    async def next_tick(self, timeout: float) -> tuple[str, float] | None:
+        """
+            returns the next tick or None if no tick arrives within the timeout
+        """
+        try:
+            tick = await wait_for(self.queue.get(), timeout=timeout)
+        except TimeoutError:
+            return None
+        if tick is None:
+            raise ConnectionError("tick stream has been disconnected")
+        return tick
+
+
+class KiteTickerTransport(TickTransport):
+    """
+        Streams the last traded price from the kite websocket.
+
+        The websocket works with instrument tokens, which are obtained with batched ltp requests while subscribing.
+        A websocket streams at most KITE_TICKER_MAX_INSTRUMENTS instruments, hence the instruments are spread over as
+        many websockets as needed, up to KITE_TICKER_MAX_CONNECTIONS. Each KiteTicker runs in its own thread and hands
+        the ticks over to the event loop.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.instruments: dict[int, str] = {}
+        # every websocket with the tokens subscribed through it
+        self.connections: list[tuple[KiteTicker, list[int]]] = []
+
+    async def subscribe(self, instruments: list[str]) -> None:
+        response = await fetch_ltp(instruments)
+        tokens = {
+            response[instrument]["instrument_token"]: instrument for instrument in instruments if instrument in response
+        }
+        if len(tokens) < len(set(instruments)):
+            logger.warning(f"could not find the token of {len(set(instruments)) - len(tokens)} instruments")
+
+        new_tokens = [token for token in tokens if token not in self.instruments]
+        free = sum(KITE_TICKER_MAX_INSTRUMENTS - len(subscribed) for _, subscribed in self.connections)
+        free += (KITE_TICKER_MAX_CONNECTIONS - len(self.connections)) * KITE_TICKER_MAX_INSTRUMENTS
+        if len(new_tokens) > free:
+            raise ConnectionError(
+                f"{len(self.instruments) + len(new_tokens)} instruments are more than the websockets can stream"
+            )
+        self.instruments.update(tokens)
+
+        loop = get_running_loop()
+        for ticker, subscribed in self.connections:
+            room = KITE_TICKER_MAX_INSTRUMENTS - len(subscribed)
+            added, new_tokens = new_tokens[:room], new_tokens[room:]
+            if added:
+                subscribed.extend(added)
+                if ticker.is_connected():
+                    ticker.subscribe(added)
+                    ticker.set_mode(ticker.MODE_LTP, added)
+        while new_tokens:
+            added, new_tokens = new_tokens[:KITE_TICKER_MAX_INSTRUMENTS], new_tokens[KITE_TICKER_MAX_INSTRUMENTS:]
+            self.connections.append((self.__connect(added, loop), added))
+
+    def __connect(self, subscribed: list[int], loop) -> KiteTicker:
+        ticker = KiteTicker(kite_context.api_key, kite_context.access_token)
+
+        def on_ticks(ws, ticks):
+            for tick in ticks:
+                if tick["instrument_token"] in self.instruments and tick.get("last_price") is not None:
+                    loop.call_soon_threadsafe(
+                        self.queue.put_nowait,
+                        (self.instruments[tick["instrument_token"]], float(tick["last_price"]))
+                    )
+
+        def on_connect(ws, connect_response):
+            # on reconnection all the instruments of the websocket are subscribed again
+            ws.subscribe(list(subscribed))
+            ws.set_mode(ws.MODE_LTP, list(subscribed))
+
+        def on_noreconnect(ws):
+            loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+        ticker.on_ticks = on_ticks
+        ticker.on_connect = on_connect
+        ticker.on_noreconnect = on_noreconnect
+        ticker.connect(threaded=True)
+        return ticker
+
+    async def close(self) -> None:
+        for ticker, _ in self.connections:
+            ticker.close()
+
+
+class SocketTransport(TickTransport):
+    """
+        Streams ticks from a server sending one json per line, like the replay server in services.replay_server.
+
+        Subscription is sent as {"subscribe": [instruments]} and every tick is received as
+        {"instrument": "NSE:INFY", "last_price": 1500.5}.
+    """
+
+    def __init__(self, host: str = REPLAY_SERVER_HOST, port: int = REPLAY_SERVER_PORT) -> None:
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.reader: StreamReader | None = None
+        self.writer: StreamWriter | None = None
+        self.reader_task: Task | None = None
+
+    async def subscribe(self, instruments: list[str]) -> None:
+        if self.writer is None:
+            self.reader, self.writer = await open_connection(self.host, self.port)
+            self.reader_task = create_task(self.__read())
+        self.writer.write((json.dumps({"subscribe": instruments}) + "\n").encode())
+        await self.writer.drain()
+
+    async def __read(self) -> None:
+        try:
+            async for line in self.reader:
+                tick = json.loads(line)
+                self.queue.put_nowait((tick["instrument"], float(tick["last_price"])))
+        except Exception:
+            logger.exception("error while reading the tick stream")
+        self.queue.put_nowait(None)
+
+    async def close(self) -> None:
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def create_transport(tick_source: str) -> TickTransport:
+    """
+        returns the transport for the tick source set in the settings
+    """
+    if tick_source == "KITE_TICKER":
+        return KiteTickerTransport()
+    if tick_source == "REPLAY":
+        return SocketTransport()
+    raise ValueError(f"unknown tick source {tick_source}")
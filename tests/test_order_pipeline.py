@@ -0,0 +1,30 @@
+import asyncio
+
+from constants.enums.position_type import PositionType
+from constants.enums.product_type import ProductType
+from constants.settings import ORDER_RATE_LIMIT
+from services.order_pipeline import Order, OrderPipeline
+from services.simulated_broker import SimulatedBroker
+
+
+def send_orders(number_of_orders: int) -> list[Order]:
+    async def send() -> list[Order]:
+        pipeline = OrderPipeline(broker=SimulatedBroker(latency=0.01))
+        orders = [
+            Order(f"STOCK{index}", 1, ProductType.DELIVERY, 'NSE', PositionType.LONG) for index in range(number_of_orders)
+        ]
+        for order in orders:
+            pipeline.submit(order)
+        await pipeline.close()
+        return orders
+
+    return asyncio.run(send())
+
+
+def test_orders_within_any_second_do_not_exceed_the_rate_limit():
+    orders = send_orders(4 * int(ORDER_RATE_LIMIT))
+
+    assert all(order.placed for order in orders)
+    sent_at = sorted(order.sent_at for order in orders)
+    peak = max(sum(1 for other in sent_at if start <= other < start + 1) for start in sent_at)
+    assert peak <= ORDER_RATE_LIMIT
@@ -0,0 +1,60 @@
+from functools import partial
+
+from constants.enums.position_type import PositionType
+from constants.enums.product_type import ProductType
+from models.account import Account
+from models.indicator_engine import indicator_engine
+from models.stage_table import StageTable
+from models.stock_info import StockInfo
+from models.stock_stages.holdings import Holding
+from models.stock_stages.positions import Position
+from services.order_pipeline import Order
+
+
+def priced_stock(symbol: str, price: float) -> StockInfo:
+    stock = StockInfo(symbol)
+    stock.row = indicator_engine.register(symbol)
+    indicator_engine.latest_price[stock.row] = price
+    indicator_engine.latest_indicator_price[stock.row] = price
+    return stock
+
+
+def position_of(stock: StockInfo) -> Position:
+    return Position(
+        buy_price=100., position_price=100., quantity=10, product_type=ProductType.DELIVERY,
+        position_type=PositionType.LONG, symbol=stock.symbol, stock=stock
+    )
+
+
+def test_sale_of_a_stage_updates_the_wallet_share_of_the_other_stages_of_the_stock():
+    stock = priced_stock('WALLETSHARE', 100.)
+    account = Account()
+    position = position_of(stock)
+    holding = Holding(
+        buy_price=50., position_price=50., quantity=10, product_type=ProductType.DELIVERY,
+        position_type=PositionType.LONG, symbol=stock.symbol, stock=stock
+    )
+    account.positions[stock.symbol] = position
+    account.holdings[stock.symbol] = holding
+
+    # with an empty wallet not even the first level of the position is below its price
+    account.stage_table.sync([position, holding])
+    account.stage_table.evaluate(account.stage_table.rows_of({stock.symbol}))
+    assert position.trigger is None
+
+    # the holding is sold at a profit and the position is evaluated again on the same day
+    del account.holdings[stock.symbol]
+    account.stage_table.remove(holding)
+    order = Order(stock.symbol, holding.quantity, ProductType.DELIVERY, 'NSE', PositionType.SHORT)
+    order.placed = True
+    holding.sold(100., partial(account.close_stage, account.holdings, holding), order)
+    assert stock.wallet > 0
+    account.stage_table.evaluate(account.stage_table.rows_of({stock.symbol}))
+
+    # the trigger is the one of a table which has loaded the position with the wallet after the sale
+    twin = position_of(stock)
+    table = StageTable()
+    table.add(twin)
+    table.evaluate(table.rows_of({stock.symbol}))
+    assert twin.trigger is not None
+    assert position.trigger == twin.trigger
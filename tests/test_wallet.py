@@ -0,0 +1,28 @@
+from datetime import date, datetime
+
+import pytest
+
+import models.wallet
+from models.wallet import Wallet
+
+
+@pytest.mark.parametrize("starting_day, today", [
+    (date(2023, 4, 17), date(2023, 4, 17)),  # the starting day itself
+    (date(2023, 4, 21), date(2023, 4, 22)),  # a saturday right after a friday start
+    (date(2023, 4, 13), date(2023, 4, 14)),  # a holiday right after the start
+    (date(2023, 4, 22), date(2023, 4, 23)),  # a start on a weekend
+])
+def test_min_return_counts_at_least_one_day(monkeypatch, starting_day: date, today: date):
+    class Today(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.combine(today, datetime.min.time()).replace(hour=12)
+
+    monkeypatch.setattr(models.wallet, 'datetime', Today)
+    wallet = Wallet(starting_date=datetime.combine(starting_day, datetime.min.time()), starting_price=100.,
+                    stock_symbol='WALLET')
+
+    wallet.accumulated_profit = 101.
+    assert wallet.has_exceeded_min_return()
+    wallet.accumulated_profit = 100.1
+    assert not wallet.has_exceeded_min_return()
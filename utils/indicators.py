@@ -0,0 +1,125 @@
+from math import nan
+
+import numpy as np
+
+
+def kahan_remove(total: np.ndarray, compensation: np.ndarray, removed: np.ndarray, observed: np.ndarray):
+    """
+        removes the values leaving the window from the rolling sums where they are observed, with Kahan summation
+        the way pandas does it. Returns the new sums and compensations
+    """
+    y = - removed - compensation
+    t = total + y
+    return np.where(observed, t, total), np.where(observed, t - total - y, compensation)
+
+
+def kahan_add(total: np.ndarray, compensation: np.ndarray, same_value_count: np.ndarray, last_value: np.ndarray,
+              added: np.ndarray, observed: np.ndarray):
+    """
+        adds the values entering the window to the rolling sums where they are observed, with Kahan summation the way
+        pandas does it, and counts how many equal values have been added in a row.
+        Returns the new sums, compensations, counts of equal values and last values
+    """
+    y = added - compensation
+    t = total + y
+    return (
+        np.where(observed, t, total),
+        np.where(observed, t - total - y, compensation),
+        np.where(observed, np.where(added == last_value, same_value_count + 1, 1), same_value_count),
+        np.where(observed, added, last_value)
+    )
+
+
+def window_sum(total: np.ndarray, nobs: np.ndarray, same_value_count: np.ndarray, last_value: np.ndarray,
+               n: int) -> np.ndarray:
+    """
+        the rolling sums, NaN till n values are observed and exact when the whole window has the same value
+    """
+    return np.where(nobs >= n, np.where(same_value_count >= nobs, last_value * nobs, total), nan)
+
+
+def rolling_sum(values: np.ndarray, n: int) -> np.ndarray:
+    """
+        Rolling sum over the last axis of a (symbols x time) matrix, equal to DataFrame.rolling(n).sum() for each row.
+
+        The window is moved one step at a time for all the symbols together, using Kahan summation and an exact
+        result when the whole window has the same value, exactly the way pandas does it. The indicator engine moves
+        its windows with the same kahan_remove, kahan_add and window_sum.
+    """
+    symbols, steps = values.shape
+    result = np.full((symbols, steps), nan)
+    nobs = np.zeros(symbols, dtype=np.int64)
+    total = np.zeros(symbols)
+    add_compensation = np.zeros(symbols)
+    remove_compensation = np.zeros(symbols)
+    same_value_count = np.zeros(symbols, dtype=np.int64)
+    last_value = np.full(symbols, nan)
+
+    for i in range(steps):
+        if i >= n:
+            removed = values[:, i - n]
+            observed = removed == removed
+            total, remove_compensation = kahan_remove(total, remove_compensation, removed, observed)
+            nobs -= observed
+
+        added = values[:, i]
+        observed = added == added
+        total, add_compensation, same_value_count, last_value = kahan_add(
+            total, add_compensation, same_value_count, last_value, added, observed
+        )
+        nobs += observed
+        result[:, i] = window_sum(total, nobs, same_value_count, last_value, n)
+    return result
+
+
+def kaufman_kernel(price, n: int = 10, pow1: int = 2, pow2: int = 30) -> np.ndarray:
+    """
+        Given the prices, it returns the Kaufman indicator values.
+
+        It takes either a 1-D series of prices or a 2-D (symbols x time) matrix and returns an array of the same shape,
+        so that every symbol can be computed in one call. The differences, the efficiency ratio and the smoothing
+        constants are computed for the whole matrix at once and the recursive part runs over the raw arrays for all
+        the symbols together. The values are identical to the pandas computation.
+
+        :param price: prices of the stock, or a matrix with the prices of one stock in each row
+        :param n: number of observation
+        :param pow1: fastest period
+        :param pow2: slowest period
+        :return:
+    """
+    prices = np.asarray(price, dtype=np.float64)
+    matrix = np.atleast_2d(prices)
+    symbols, steps = matrix.shape
+
+    abs_diffx = np.full((symbols, steps), nan)
+    abs_diffx[:, 1:] = np.abs(matrix[:, 1:] - matrix[:, :-1])
+    abs_price_change = np.full((symbols, steps), nan)
+    if steps > n:
+        abs_price_change[:, n:] = np.abs(matrix[:, n:] - matrix[:, :-n])
+    vol = rolling_sum(abs_diffx, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        er = abs_price_change / vol
+    fastest_sc, slowest_sc = 2 / (pow1 + 1), 2 / (pow2 + 1)
+
+    sc = (er * (fastest_sc - slowest_sc) + slowest_sc) ** 2.0
+
+    answer = np.zeros((symbols, steps))
+    previous = np.zeros(symbols)
+    first_value = np.ones(symbols, dtype=bool)
+    for i in range(steps):
+        current_price, current_vol, current_sc = matrix[:, i], vol[:, i], sc[:, i]
+        # if volatility is 0 it turns out to be nan so is considered separately
+        zero_vol = current_vol == 0
+        valid = ~zero_vol & (current_sc == current_sc)
+        previous = np.where(
+            zero_vol,
+            previous + 1 * (current_price - previous),
+            np.where(
+                valid,
+                np.where(first_value, current_price, previous + current_sc * (current_price - previous)),
+                nan
+            )
+        )
+        first_value &= ~valid
+        answer[:, i] = previous
+    return answer.reshape(prices.shape)
@@ -1,13 +1,28 @@
 from contextlib import contextmanager
 import traceback
-from motor.motor_asyncio import AsyncIOMotorClient
 
 from utils.exceptions.db_connection import DbConnectionException
 
-from constants.db_settings import HOST, DATABASE_NAME
+from constants.settings import DB_BACKEND, SQLITE_DB_PATH
 
-CLIENT = AsyncIOMotorClient(HOST)
-DATABASE = CLIENT[DATABASE_NAME]
+DATABASE = None
+
+
+def get_database():
+    """
+        the database of the backend chosen in the settings, created when it is first used so that importing the
+        models neither connects to the cluster nor needs motor with the sqlite backend
+    """
+    global DATABASE
+    if DATABASE is None:
+        if DB_BACKEND == "SQLITE":
+            from utils.sqlite_db import SqliteDatabase
+            DATABASE = SqliteDatabase(SQLITE_DB_PATH)
+        else:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            from constants.db_settings import HOST, DATABASE_NAME
+            DATABASE = AsyncIOMotorClient(HOST)[DATABASE_NAME]
+    return DATABASE
 
 
 @contextmanager
@@ -17,7 +32,15 @@ def connect_to_collection(collection_name: str):
         If any error occurs then it shows an error occurred from our side.
     """
     try:
-        yield DATABASE[collection_name]
+        yield get_database()[collection_name]
     except:
         traceback.print_exc()
         raise DbConnectionException()
+
+
+async def ensure_unique_index(collection_name: str, field: str):
+    """
+        creates a unique index on the field if it is not present yet
+    """
+    with connect_to_collection(collection_name) as collection:
+        await collection.create_index(field, unique=True)
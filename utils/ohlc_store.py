@@ -0,0 +1,166 @@
+"""
+    Local store of the daily bars (open, high, low, close and volume) the screener runs on.
+
+    Like the tick journal, the bars of each symbol are appended to temp/ohlc/<symbol>.bin as records of the day
+    (days since epoch) followed by the float64 open, high, low, close and volume (see utils.record_file).
+    Each run only fetches the bars from the last stored day on from the data source and appends the new ones, so a
+    daily screen downloads a couple of bars per symbol instead of the whole year. If the last stored bar no longer
+    matches (the prices have been adjusted for a split or a dividend) the symbol is fetched again from scratch.
+    Nothing is fetched for a symbol which already has the bar of the last completed trading day.
+
+    The bars come from a data source: YahooDataSource downloads them, CsvDataSource reads them from a csv file per
+    symbol and OfflineDataSource provides nothing, so the screener runs from the stored bars without network.
+"""
+import os
+from abc import ABC, abstractmethod
+from logging import Logger
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils.logger import get_logger
+from utils.record_file import append_records, read_records
+from utils.trading_calendar import trading_calendar
+
+logger: Logger = get_logger(__name__)
+
+OHLC_DIRECTORY = "temp/ohlc"
+BAR_DTYPE = np.dtype([
+    ('day', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'), ('volume', '<f8')
+])
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# the bar of the day is only complete once the market has closed
+MARKET_CLOSE_TIME = time(15, 30)
+
+
+class DataSource(ABC):
+    """
+        provides the daily bars of a symbol, as a dataframe indexed by date with the columns of BAR_COLUMNS
+    """
+
+    @abstractmethod
+    def fetch(self, symbol: str, start: date) -> pd.DataFrame:
+        """
+            the bars from start (included) till today
+        """
+
+
+class YahooDataSource(DataSource):
+    def fetch(self, symbol: str, start: date) -> pd.DataFrame:
+        import yfinance as yf
+
+        data = yf.download(tickers=f"{symbol}.NS", start=start, interval='1d', progress=False)
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+        return data
+
+
+class CsvDataSource(DataSource):
+    """
+        reads the bars from <directory>/<symbol>.csv, with a Date column and the columns of BAR_COLUMNS
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def fetch(self, symbol: str, start: date) -> pd.DataFrame:
+        path = os.path.join(self.directory, f"{symbol}.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        data = pd.read_csv(path, index_col='Date', parse_dates=True)
+        return data[data.index >= pd.Timestamp(start)]
+
+
+class OfflineDataSource(DataSource):
+    def fetch(self, symbol: str, start: date) -> pd.DataFrame:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+
+def store_path(symbol: str) -> str:
+    return os.path.join(OHLC_DIRECTORY, f"{symbol}.bin")
+
+
+def read_bars(symbol: str) -> np.ndarray:
+    """
+        returns the bars of the symbol as a read only memory mapped record array, an incomplete record at the end
+        (if the process stopped while writing) is ignored
+    """
+    return read_records(store_path(symbol), BAR_DTYPE)
+
+
+def last_stored_day(symbol: str) -> date | None:
+    bars = read_bars(symbol)
+    return None if bars.size == 0 else date(1970, 1, 1) + timedelta(days=int(bars['day'][-1]))
+
+
+def append_bars(symbol: str, data: pd.DataFrame) -> int:
+    """
+        appends the bars of the dataframe which are after the last stored day and returns how many were appended
+    """
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    days = index.values.astype('datetime64[D]').astype(np.int64)
+
+    last_day = last_stored_day(symbol)
+    new = days > ((last_day - date(1970, 1, 1)).days if last_day is not None else np.iinfo(np.int64).min)
+    new &= data['Close'].notna().to_numpy()
+    if not new.any():
+        return 0
+
+    bars = np.empty(int(new.sum()), dtype=BAR_DTYPE)
+    bars['day'] = days[new]
+    for column in BAR_COLUMNS:
+        bars[column.lower()] = data[column].to_numpy(dtype=float)[new] if column in data else np.nan
+
+    append_records(store_path(symbol), bars)
+    return bars.size
+
+
+def last_completed_day(now: datetime | None = None) -> date:
+    now = now or datetime.now()
+    return now.date() if now.time() >= MARKET_CLOSE_TIME else now.date() - timedelta(days=1)
+
+
+def update_bars(symbol: str, source: DataSource, history_days: int = 365) -> int:
+    """
+        fetches the completed bars after the last stored one and appends them, a symbol without any stored bar gets
+        the bars of the last history_days days. Returns how many bars were appended.
+
+        The prices of the source are adjusted for splits and dividends, which changes the past prices as well. Hence
+        the last stored bar is fetched again along with the new ones, and if its close no longer matches the stored
+        one the bars of the symbol are fetched again from scratch, so that all of them are on the same scale.
+    """
+    completed = last_completed_day()
+    last_day = last_stored_day(symbol)
+    if last_day is not None and trading_calendar.trading_days(last_day + timedelta(days=1), completed) == 0:
+        return 0
+
+    data = source.fetch(symbol, last_day or completed - timedelta(days=history_days))
+    if data.empty:
+        return 0
+    data = data[pd.DatetimeIndex(data.index).date <= completed]
+
+    if last_day is not None:
+        overlap = data[pd.DatetimeIndex(data.index).date == last_day]
+        stored_close = float(read_bars(symbol)['close'][-1])
+        if not overlap.empty and not np.isclose(float(overlap['Close'].iloc[0]), stored_close, rtol=1e-6):
+            logger.info(f"the prices of {symbol} have been adjusted since they were stored, fetching all of them again")
+            os.remove(store_path(symbol))
+            return update_bars(symbol, source, history_days)
+    return append_bars(symbol, data)
+
+
+def load_bars(symbol: str, source: DataSource, history_days: int = 365) -> pd.DataFrame:
+    """
+        the bars of the last history_days days after updating the store from the source, indexed by date
+    """
+    update_bars(symbol, source, history_days)
+    bars = read_bars(symbol)
+    start = (last_completed_day() - timedelta(days=history_days) - date(1970, 1, 1)).days
+    bars = bars[bars['day'] >= start]
+    return pd.DataFrame(
+        {column: np.asarray(bars[column.lower()]) for column in BAR_COLUMNS},
+        index=pd.DatetimeIndex(np.asarray(bars['day']).astype('datetime64[D]').astype('datetime64[ns]'), name='Date')
+    )
@@ -0,0 +1,34 @@
+"""
+    Append only files of fixed size numpy records, used by the tick journal and the ohlc store.
+
+    The records are written as they are in memory, hence the file can be mapped with numpy.memmap without any
+    parsing. A write interrupted by the process stopping can only leave an incomplete record at the end, which is
+    ignored when reading and dropped by the next append.
+"""
+import os
+
+import numpy as np
+
+
+def read_records(path: str, dtype: np.dtype) -> np.ndarray:
+    """
+        returns the records of the file as a read only memory mapped record array, empty if there is no file
+    """
+    count = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def append_records(path: str, records: np.ndarray) -> None:
+    """
+        appends the records at the end of the file, creating it along with its directory if needed
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as file:
+        # an incomplete record left by an interrupted write is dropped so that the records stay aligned
+        incomplete = file.tell() % records.dtype.itemsize
+        if incomplete:
+            file.truncate(file.tell() - incomplete)
+        file.write(records.tobytes())
@@ -0,0 +1,229 @@
+from logging import Logger
+from typing import Any
+
+from pymongo import DeleteOne, UpdateOne
+
+from constants.settings import DB_BATCH_SIZE
+from utils.logger import get_logger
+from utils.nr_db import connect_to_collection
+
+logger: Logger = get_logger(__name__)
+
+
+class Repository:
+    """
+        Persistence of one collection whose documents are identified by their symbol.
+
+        It keeps an identity map of the objects loaded or saved during the session along with the document each of
+        them last had in the db. Hence, whether a symbol exists is known without querying for it, the same object is
+        returned for a symbol every time, and an update only sets the fields which have changed since the document
+        was last read or written. An object whose fields have not changed is not written at all.
+
+        The fields in INSERT_ONLY_FIELDS of the model are only written when the document is inserted. A change of
+        only the TIMESTAMP_FIELD of the model does not count as a change, it is written along with the other changes.
+    """
+
+    def __init__(self, model_class) -> None:
+        self.model_class = model_class
+        self.collection_name: str = model_class.COLLECTION_NAME
+        self.insert_only_fields: tuple[str, ...] = model_class.INSERT_ONLY_FIELDS
+        self.timestamp_field: str | None = model_class.TIMESTAMP_FIELD
+        # symbol -> object, and symbol -> document of the object as it is in the db
+        self.identity_map: dict[str, Any] = {}
+        self.documents: dict[str, dict[str, Any]] = {}
+
+    def exists(self, symbol: str) -> bool:
+        return symbol in self.documents
+
+    def register(self, model, document: dict[str, Any]) -> None:
+        """
+            the document of the model is in the db as given
+        """
+        self.identity_map[document['symbol']] = model
+        self.documents[document['symbol']] = document
+
+    def forget(self, symbol: str) -> None:
+        self.identity_map.pop(symbol, None)
+        self.documents.pop(symbol, None)
+
+    def changes(self, document: dict[str, Any]) -> dict[str, Any]:
+        """
+            fields of the document to be set, empty if nothing has changed
+        """
+        saved = self.documents[document['symbol']]
+        changes = {
+            key: value for key, value in document.items()
+            if key not in self.insert_only_fields and (key not in saved or saved[key] != value)
+        }
+        if changes.keys() - {self.timestamp_field}:
+            return changes
+        return {}
+
+    def update_of(self, document: dict[str, Any]) -> dict[str, dict] | None:
+        """
+            update for the upsert of the document, None if the document in the db is already up-to-date
+        """
+        if self.exists(document['symbol']):
+            changes = self.changes(document)
+            return {'$set': changes} if changes else None
+
+        update = {'$set': {key: value for key, value in document.items() if key not in self.insert_only_fields}}
+        if self.insert_only_fields:
+            update['$setOnInsert'] = {key: document[key] for key in self.insert_only_fields if key in document}
+        return update
+
+    def write_operation(self, document: dict[str, Any]) -> UpdateOne | None:
+        update = self.update_of(document)
+        return UpdateOne({'symbol': document['symbol']}, update, upsert=True) if update else None
+
+    def saved(self, model, document: dict[str, Any]) -> None:
+        """
+            the document has been written, the fields which were not written are already the same in the db
+        """
+        symbol = document['symbol']
+        if self.exists(symbol):
+            self.documents[symbol].update(self.changes(document))
+            self.identity_map[symbol] = model
+        else:
+            self.register(model, document)
+
+    async def find_one(self, search_dict: dict[str, Any]):
+        if search_dict.keys() == {'symbol'} and search_dict['symbol'] in self.identity_map:
+            return self.identity_map[search_dict['symbol']]
+
+        with connect_to_collection(self.collection_name) as collection:
+            data = await collection.find_one(search_dict, self.model_class.PROJECTION)
+        if not data:
+            return None
+        if data['symbol'] in self.identity_map:
+            return self.identity_map[data['symbol']]
+        model = self.model_class.to_object(data)
+        self.register(model, data)
+        return model
+
+    async def find_all(self, batch_size: int = DB_BATCH_SIZE) -> list:
+        """
+            only the fields used by to_object are fetched, batch_size documents per round trip
+        """
+        models = []
+        with connect_to_collection(self.collection_name) as collection:
+            cursor = collection.find({}, self.model_class.PROJECTION, batch_size=batch_size)
+            async for document in cursor:
+                model = self.model_class.to_object(document)
+                self.register(model, document)
+                models.append(model)
+        return models
+
+    async def save(self, model) -> None:
+        document = model.json()
+        update = self.update_of(document)
+        if update is None:
+            return
+        with connect_to_collection(self.collection_name) as collection:
+            await collection.update_one({'symbol': document['symbol']}, update, upsert=True)
+        self.saved(model, document)
+
+    async def update(self, search_dict: dict[str, Any], data: dict[str, Any]) -> None:
+        with connect_to_collection(self.collection_name) as collection:
+            await collection.update_one(search_dict, {'$set': data})
+        symbol = search_dict.get('symbol')
+        if self.exists(symbol):
+            self.documents[symbol].update(data)
+
+    async def delete(self, search_dict: dict[str, Any]) -> None:
+        with connect_to_collection(self.collection_name) as collection:
+            await collection.delete_one(search_dict)
+        if 'symbol' in search_dict:
+            self.forget(search_dict['symbol'])
+
+    async def bulk_save(self, models: list, deleted_symbols: list[str] = ()) -> None:
+        """
+            saves the models which have changed and deletes the documents of the deleted symbols with a single bulk
+            write. Nothing is sent if nothing has changed.
+        """
+        documents = [(model, model.json()) for model in models]
+        operations = [self.write_operation(document) for _, document in documents]
+        changed = [(model, document) for (model, document), operation in zip(documents, operations) if operation]
+        operations = [
+            operation for operation in operations if operation
+        ] + [
+            DeleteOne({'symbol': symbol}) for symbol in deleted_symbols
+        ]
+        if not operations:
+            return
+        with connect_to_collection(self.collection_name) as collection:
+            await collection.bulk_write(operations, ordered=False)
+        for model, document in changed:
+            self.saved(model, document)
+        for symbol in deleted_symbols:
+            self.forget(symbol)
+
+
+repositories: dict[str, Repository] = {}
+
+
+def repository_of(model_class) -> Repository:
+    """
+        the repository of the collection of the model class, there is only one per collection
+    """
+    if model_class.COLLECTION_NAME not in repositories:
+        repositories[model_class.COLLECTION_NAME] = Repository(model_class)
+    return repositories[model_class.COLLECTION_NAME]
+
+
+class Persistent:
+    """
+        CRUD of the models (StockInfo, Holding and Position) through the repository of their collection.
+        A model defines COLLECTION_NAME, PROJECTION, json and to_object, and its json has the symbol.
+    """
+
+    COLLECTION_NAME: str
+    PROJECTION: dict[str, int]
+    INSERT_ONLY_FIELDS: tuple[str, ...] = ()
+    TIMESTAMP_FIELD: str | None = None
+
+    __slots__ = ()
+
+    @classmethod
+    def repository(cls) -> Repository:
+        return repository_of(cls)
+
+    @classmethod
+    async def find_by_name(cls, search_dict):
+        """
+            This function is used to find a collection by trade symbol
+        """
+        return await cls.repository().find_one(search_dict)
+
+    async def save_to_db(self):
+        """
+            function to save the object into the database, only the fields which have changed are written
+        """
+        await self.repository().save(self)
+
+    @classmethod
+    async def retrieve_all_services(cls, batch_size: int = DB_BATCH_SIZE):
+        """
+            provides the total list of documents
+        """
+        return await cls.repository().find_all(batch_size)
+
+    @classmethod
+    async def bulk_save(cls, models: list, deleted_symbols: list[str] = ()):
+        """
+            saves all the models and deletes the documents of the deleted symbols with a single bulk write
+        """
+        await cls.repository().bulk_save(models, deleted_symbols)
+
+    async def delete_from_db(self, search_dict):
+        """
+            This function is used to delete the document from collection
+        """
+        await self.repository().delete(search_dict)
+
+    @classmethod
+    async def update_in_db(cls, search_dict, data: dict[str, Any]):
+        """
+            This function is used to update fields of the document
+        """
+        await cls.repository().update(search_dict, data)
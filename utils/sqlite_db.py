@@ -0,0 +1,272 @@
+"""
+    Embedded storage backend, used instead of mongo when DB_BACKEND is "SQLITE" in the settings.
+
+    It provides the part of the motor collection API used by the application (find, find_one, insert_one, update_one,
+    delete_one, bulk_write and create_index) on top of a local sqlite file. Every collection is a table of json
+    documents, and the filters, which are equality filters on the fields of the document, are turned into sql on
+    json_extract so that they can use the indexes created by create_index.
+
+    The statements take microseconds on a local file, hence they are run directly on the event loop instead of in a
+    thread. Datetimes are stored as {"$date": iso format} and read back as datetimes.
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any
+
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertOneResult, UpdateResult
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+    raise TypeError(f"{type(value).__name__} can not be stored in the sqlite backend")
+
+
+def _decode_object(data: dict):
+    if data.keys() == {"$date"}:
+        return datetime.fromisoformat(data["$date"])
+    return data
+
+
+def encode(document: dict[str, Any]) -> str:
+    return json.dumps(document, default=_encode_value)
+
+
+def decode(text: str) -> dict[str, Any]:
+    return json.loads(text, object_hook=_decode_object)
+
+
+def field_path(field: str) -> str:
+    """
+        the expression of the field, the indexes are created on the same expression so that they are used
+    """
+    return "json_extract(document, '$.\"" + field.replace("'", "''").replace('"', '') + "\"')"
+
+
+def where(search_dict: dict[str, Any] | None) -> tuple[str, list]:
+    clauses, parameters = [], []
+    for field, value in (search_dict or {}).items():
+        if field.startswith('$'):
+            raise ValueError(f"{field} is not supported by the sqlite backend, only equality filters are")
+        if field == '_id':
+            clauses.append("id = ?")
+            parameters.append(value)
+        elif value is None:
+            clauses.append(f"{field_path(field)} IS NULL")
+        elif isinstance(value, (str, int, float)):
+            clauses.append(f"{field_path(field)} = ?")
+            parameters.append(value)
+        elif isinstance(value, dict):
+            raise ValueError(
+                f"{', '.join(value)} on {field} is not supported by the sqlite backend, only equality filters are"
+            )
+        else:
+            raise TypeError(f"the sqlite backend can not filter {field} on a {type(value).__name__}")
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", parameters
+
+
+def project(document_id: int, document: dict[str, Any], projection: dict[str, Any] | list[str] | None):
+    document = {'_id': document_id, **document}
+    if not projection:
+        return document
+    if not isinstance(projection, dict):
+        projection = {field: 1 for field in projection}
+
+    included = {field for field, value in projection.items() if value and field != '_id'}
+    if included:
+        result = {field: value for field, value in document.items() if field in included}
+        if projection.get('_id', 1):
+            result['_id'] = document_id
+        return result
+    return {field: value for field, value in document.items() if projection.get(field, 1)}
+
+
+def apply_update(document: dict[str, Any], update: dict[str, dict], inserting: bool) -> None:
+    for operator, fields in update.items():
+        if operator == '$set' or (operator == '$setOnInsert' and inserting):
+            document.update(fields)
+        elif operator == '$setOnInsert':
+            continue
+        elif operator == '$unset':
+            for field in fields:
+                document.pop(field, None)
+        elif not operator.startswith('$'):
+            raise ValueError("update only works with $ operators")
+        else:
+            raise ValueError(f"{operator} is not supported by the sqlite backend")
+
+
+class SqliteCursor:
+    """
+        async iteration over the documents found, like the motor cursor
+    """
+
+    def __init__(self, collection: 'SqliteCollection', search_dict, projection) -> None:
+        self.collection = collection
+        self.search_dict = search_dict
+        self.projection = projection
+        self.documents: list[dict] | None = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        if self.documents is None:
+            self.documents = [
+                project(document_id, document, self.projection)
+                for document_id, document in self.collection.select(self.search_dict)
+            ]
+            self.documents.reverse()
+        if not self.documents:
+            raise StopAsyncIteration
+        return self.documents.pop()
+
+    async def to_list(self, length: int | None = None) -> list[dict[str, Any]]:
+        documents = []
+        async for document in self:
+            documents.append(document)
+            if length and len(documents) == length:
+                break
+        return documents
+
+
+class SqliteCollection:
+    def __init__(self, connection: sqlite3.Connection, name: str) -> None:
+        self.connection = connection
+        self.name = name
+        self.table = '"' + name.replace('"', '""') + '"'
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} (id INTEGER PRIMARY KEY, document TEXT NOT NULL)"
+        )
+
+    def select(self, search_dict, limit: int | None = None) -> list[tuple[int, dict[str, Any]]]:
+        clause, parameters = where(search_dict)
+        query = f"SELECT id, document FROM {self.table}{clause} ORDER BY id"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return [(document_id, decode(text)) for document_id, text in self.connection.execute(query, parameters)]
+
+    def __execute(self, query: str, parameters: list) -> sqlite3.Cursor:
+        try:
+            return self.connection.execute(query, parameters)
+        except sqlite3.IntegrityError as error:
+            raise DuplicateKeyError(f"{self.name}: {error}")
+
+    def __insert(self, document: dict[str, Any]) -> int:
+        document = {field: value for field, value in document.items() if field != '_id'}
+        return self.__execute(f"INSERT INTO {self.table} (document) VALUES (?)", [encode(document)]).lastrowid
+
+    def __update(self, search_dict, update: dict[str, dict], upsert: bool) -> dict[str, Any]:
+        """
+            returns the counts of the update like the raw result of mongo
+        """
+        found = self.select(search_dict, limit=1)
+        if found:
+            document_id, document = found[0]
+            updated = dict(document)
+            apply_update(updated, update, inserting=False)
+            if updated != document:
+                self.__execute(f"UPDATE {self.table} SET document = ? WHERE id = ?", [encode(updated), document_id])
+            return {'n': 1, 'nModified': int(updated != document), 'updatedExisting': True}
+        if not upsert:
+            return {'n': 0, 'nModified': 0, 'updatedExisting': False}
+
+        document = {
+            field: value for field, value in (search_dict or {}).items()
+            if not field.startswith('$') and not isinstance(value, dict)
+        }
+        apply_update(document, update, inserting=True)
+        return {'n': 1, 'nModified': 0, 'updatedExisting': False, 'upserted': self.__insert(document)}
+
+    def __delete(self, search_dict) -> int:
+        found = self.select(search_dict, limit=1)
+        if found:
+            self.__execute(f"DELETE FROM {self.table} WHERE id = ?", [found[0][0]])
+        return len(found)
+
+    def find(self, search_dict=None, projection=None, **kwargs) -> SqliteCursor:
+        return SqliteCursor(self, search_dict, projection)
+
+    async def find_one(self, search_dict=None, projection=None, **kwargs) -> dict[str, Any] | None:
+        found = self.select(search_dict, limit=1)
+        return project(*found[0], projection) if found else None
+
+    async def insert_one(self, document: dict[str, Any], **kwargs) -> InsertOneResult:
+        return InsertOneResult(self.__insert(document), True)
+
+    async def update_one(self, search_dict, update: dict[str, dict], upsert: bool = False, **kwargs) -> UpdateResult:
+        return UpdateResult(self.__update(search_dict, update, upsert), True)
+
+    async def delete_one(self, search_dict, **kwargs) -> DeleteResult:
+        return DeleteResult({'n': self.__delete(search_dict)}, True)
+
+    async def bulk_write(self, requests: list, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        """
+            the requests are written in a single transaction. Like mongo, an ordered bulk write stops at the first
+            error and an unordered one carries on, and the requests written before the error are kept
+        """
+        result = {
+            'nInserted': 0, 'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': [],
+            'writeErrors': [], 'writeConcernErrors': []
+        }
+        first_error: Exception | None = None
+        self.connection.execute("BEGIN")
+        try:
+            for index, request in enumerate(requests):
+                try:
+                    if isinstance(request, InsertOne):
+                        self.__insert(request._doc)
+                        result['nInserted'] += 1
+                    elif isinstance(request, UpdateOne):
+                        counts = self.__update(request._filter, request._doc, request._upsert)
+                        if 'upserted' in counts:
+                            result['nUpserted'] += 1
+                            result['upserted'].append({'index': index, '_id': counts['upserted']})
+                        else:
+                            result['nMatched'] += counts['n']
+                            result['nModified'] += counts['nModified']
+                    elif isinstance(request, DeleteOne):
+                        result['nRemoved'] += self.__delete(request._filter)
+                    else:
+                        raise TypeError(f"{type(request).__name__} is not supported by the sqlite backend")
+                except Exception as error:
+                    first_error = first_error or error
+                    if ordered:
+                        break
+        finally:
+            self.connection.execute("COMMIT")
+        if first_error is not None:
+            raise first_error
+        return BulkWriteResult(result, True)
+
+    async def create_index(self, keys: str | list[tuple[str, int]], unique: bool = False, **kwargs) -> str:
+        fields = [keys] if isinstance(keys, str) else [field for field, _ in keys]
+        name = "_".join([self.name, *fields])
+        self.__execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS \"{name}\" "
+            f"ON {self.table} ({', '.join(field_path(field) for field in fields)})",
+            []
+        )
+        return name
+
+
+class SqliteDatabase:
+    def __init__(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.collections: dict[str, SqliteCollection] = {}
+
+    def __getitem__(self, name: str) -> SqliteCollection:
+        if name not in self.collections:
+            self.collections[name] = SqliteCollection(self.connection, name)
+        return self.collections[name]
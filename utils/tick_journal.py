@@ -0,0 +1,105 @@
+"""
+    Append only binary journal of the ticks received for each symbol.
+
+    Every tick is stored as a record of a float64 timestamp (seconds since epoch) and a float64 price in
+    temp/ticks/<symbol>.bin (TICK_JOURNAL_DIRECTORY of the settings), see utils.record_file. The file can be mapped
+    with numpy.memmap without any parsing, so restarting in the middle of the session, the dashboard or any offline
+    analysis can read the ticks of the day instantly.
+
+    The state of the indicators after a number of ticks is saved next to it in <symbol>.state.npz, so that the
+    indicators can be restored without processing the whole journal again.
+
+    The csv files written earlier can be converted once by running: python -m utils.tick_journal
+"""
+import os
+from glob import glob
+
+import numpy as np
+import pandas as pd
+
+from constants.settings import TICK_JOURNAL_DIRECTORY
+from utils.record_file import append_records, read_records
+
+JOURNAL_DIRECTORY = TICK_JOURNAL_DIRECTORY
+TICK_DTYPE = np.dtype([('timestamp', '<f8'), ('price', '<f8')])
+
+
+def journal_path(symbol: str, directory: str | None = None) -> str:
+    return os.path.join(directory or JOURNAL_DIRECTORY, f"{symbol}.bin")
+
+
+def append_ticks(symbol: str, timestamps: list[float], prices: list[float]) -> None:
+    """
+        appends the ticks at the end of the journal of the symbol
+    """
+    ticks = np.empty(len(prices), dtype=TICK_DTYPE)
+    ticks['timestamp'] = timestamps
+    ticks['price'] = prices
+    append_records(journal_path(symbol), ticks)
+
+
+def snapshot_path(symbol: str) -> str:
+    return os.path.join(JOURNAL_DIRECTORY, f"{symbol}.state.npz")
+
+
+def save_snapshot(symbol: str, ticks: int, state: dict[str, np.ndarray]) -> None:
+    """
+        saves the indicator state of the symbol after the first ticks of its journal have been processed.
+        It is written to a temporary file first so that an interrupted write does not leave a broken snapshot
+    """
+    os.makedirs(JOURNAL_DIRECTORY, exist_ok=True)
+    path = snapshot_path(symbol)
+    with open(f"{path}.tmp", "wb") as file:
+        np.savez(file, ticks=ticks, **state)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_snapshot(symbol: str) -> tuple[int, dict[str, np.ndarray]] | None:
+    """
+        returns the number of ticks and the indicator state saved by save_snapshot, None if there is no snapshot
+    """
+    path = snapshot_path(symbol)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as snapshot:
+            state = {name: snapshot[name] for name in snapshot.files if name != 'ticks'}
+            return int(snapshot['ticks']), state
+    except:
+        return None
+
+
+def read_ticks(symbol: str, directory: str | None = None) -> np.ndarray:
+    """
+        returns the ticks of the symbol as a read only memory mapped record array with timestamp and price fields.
+
+        An incomplete record at the end (if the process stopped while writing) is ignored.
+    """
+    return read_records(journal_path(symbol, directory), TICK_DTYPE)
+
+
+def convert_csv_journals(directory: str = "temp") -> list[str]:
+    """
+        converts the csv files holding the prices of each symbol into binary journals.
+
+        The csv files do not hold the time of the ticks, hence the timestamps are stored as NaN.
+        The symbols which already have a journal are skipped.
+
+        :return: the list of converted symbols
+    """
+    converted = []
+    for file in sorted(glob(os.path.join(directory, "*.csv"))):
+        symbol = os.path.basename(file)[:-len(".csv")]
+        if os.path.exists(journal_path(symbol)):
+            continue
+        history = pd.read_csv(file)
+        if 'price' not in history.columns:
+            continue
+        prices = history['price'].bfill().ffill().dropna().astype(float)
+        append_ticks(symbol, [np.nan] * len(prices), list(prices))
+        converted.append(symbol)
+    return converted
+
+
+if __name__ == "__main__":
+    print(f"converted {len(convert_csv_journals())} csv files")
@@ -0,0 +1,54 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from utils.exclude_dates import load_holidays
+
+
+class TradingCalendar:
+    """
+        Counts the trading days (weekdays which are not holidays) between two dates, both included.
+
+        The holidays are loaded once from temp/holidays.json and kept sorted, so the holidays within a range are found
+        with a bisect while the weekdays are counted arithmetically. Like the rrule count it replaces, every holiday
+        within the range is subtracted.
+
+        The results are memoised for the current day, as the same ranges are asked for on every tick.
+    """
+
+    def __init__(self) -> None:
+        self.__holidays: list[date] | None = None
+        self.__memo: dict[tuple[date, date], int] = {}
+        self.__memo_day: date | None = None
+
+    @property
+    def holidays(self) -> list[date]:
+        if self.__holidays is None:
+            self.__holidays = sorted(day.date() for day in load_holidays()['dates'])
+        return self.__holidays
+
+    @staticmethod
+    def weekdays(start: date, end: date) -> int:
+        """
+            number of days from monday to friday between start and end, both included
+        """
+        days = (end - start).days + 1
+        if days <= 0:
+            return 0
+        weeks, remaining = divmod(days, 7)
+        return weeks * 5 + sum(1 for offset in range(remaining) if (start.weekday() + offset) % 7 < 5)
+
+    def trading_days(self, start: date, end: date) -> int:
+        today = datetime.now().date()
+        if self.__memo_day != today:
+            self.__memo = {}
+            self.__memo_day = today
+
+        if (start, end) not in self.__memo:
+            days = self.weekdays(start, end)
+            if days > 0:
+                days -= bisect_right(self.holidays, end) - bisect_left(self.holidays, start)
+            self.__memo[(start, end)] = days
+        return self.__memo[(start, end)]
+
+
+trading_calendar = TradingCalendar()